@@ -4,6 +4,13 @@ from flask_login import LoginManager
 import os
 from dotenv import load_dotenv
 from urllib.parse import quote
+from app.db_pool import engine_options_from_env
+from app.db_routing import RoutingSession, REPLICA_BIND, init_routing
+from app.sql_profiler import init_profiler
+from app.events import init_events
+from app.assets import init_assets
+from app.compression import init_compression
+from app.fragment_cache import init_fragment_cache
 
 load_dotenv()
 
@@ -11,27 +18,73 @@ app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY') or 'dev_key_very_secret'
 
 # Database configuration
-# MYSQL_HOST = os.getenv('MYSQL_HOST') or 'localhost'
-# MYSQL_PORT = os.getenv('MYSQL_PORT') or 3306
-# MYSQL_USER = os.getenv('MYSQL_USER') or 'root'
-# MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD') or 'root'
-# MYSQL_DB = os.getenv('MYSQL_DB') or 'car_repair_db'
-
-# app.config["SQLALCHEMY_DATABASE_URI"] = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}?charset=utf8mb4" % quote('admin@123')
-app.config["SQLALCHEMY_DATABASE_URI"] = "mysql+pymysql://root:%s@localhost/car_repair_db?charset=utf8mb4" % quote('admin@123')
+MYSQL_HOST = os.getenv('MYSQL_HOST') or 'localhost'
+MYSQL_PORT = os.getenv('MYSQL_PORT') or 3306
+MYSQL_USER = os.getenv('MYSQL_USER') or 'root'
+MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD') or 'admin@123'
+MYSQL_DB = os.getenv('MYSQL_DB') or 'car_repair_db'
+
+app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv('DATABASE_URL') or \
+    f"mysql+pymysql://{MYSQL_USER}:{quote(MYSQL_PASSWORD, safe='')}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}?charset=utf8mb4"
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options_from_env(app.config["SQLALCHEMY_DATABASE_URI"])
+
+# Optional read replica for reports and list pages (see app/db_routing.py)
+if os.getenv('DATABASE_REPLICA_URL'):
+    app.config["SQLALCHEMY_BINDS"] = {
+        REPLICA_BIND: dict(url=os.getenv('DATABASE_REPLICA_URL'),
+                           **engine_options_from_env(os.getenv('DATABASE_REPLICA_URL')))
+    }
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = True
 app.config["PAGE_SIZE"] = 10
 
-db = SQLAlchemy(app=app)
+# SQL instrumentation (see app/sql_profiler.py)
+app.config["SLOW_QUERY_MS"] = float(os.getenv('SLOW_QUERY_MS') or 200)
+app.config["SLOW_QUERY_LOG"] = os.getenv('SLOW_QUERY_LOG') or 'logs/slow_queries.log'
+app.config["SERVER_TIMING_DETAIL"] = (os.getenv('SERVER_TIMING_DETAIL') or '').lower() in ('1', 'true', 'yes', 'on')
+app.config["SQL_QUERY_BUDGET_MODE"] = os.getenv('SQL_QUERY_BUDGET_MODE') or 'log'
+app.config["SQL_QUERY_BUDGET_DEFAULT"] = int(os.getenv('SQL_QUERY_BUDGET_DEFAULT') or 30)
+app.config["SQL_QUERY_BUDGETS"] = {
+    'admin.dashboard': 12,
+    'admin.low_stock_alert': 10,
+    'admin.accessories': 10,
+    'cashier.home': 12,
+    'reception.home': 12,
+    'technician.home': 12,
+}
+
+# Live pages (see app/events.py): streams per worker process, and how often each worker
+# checks table_versions for changes committed by other workers
+app.config["SSE_MAX_STREAMS"] = int(os.getenv('SSE_MAX_STREAMS') or 100)
+app.config["EVENTS_POLL_SECONDS"] = float(os.getenv('EVENTS_POLL_SECONDS') or 3)
+
+# Response compression (see app/compression.py); brotli is used when the package is installed
+app.config["COMPRESS_MIN_SIZE"] = int(os.getenv('COMPRESS_MIN_SIZE') or 1024)
+app.config["COMPRESS_LEVEL"] = int(os.getenv('COMPRESS_LEVEL') or 6)
+app.config["COMPRESS_BR_QUALITY"] = int(os.getenv('COMPRESS_BR_QUALITY') or 4)
+
+# Rendered template fragments (see app/fragment_cache.py) and compiled templates on disk
+app.config["FRAGMENT_CACHE_MAX_ENTRIES"] = int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES') or 10000)
+app.config["FRAGMENT_CACHE_MAX_BYTES"] = int(os.getenv('FRAGMENT_CACHE_MAX_BYTES') or 8 * 1024 * 1024)
+app.config["JINJA_BYTECODE_CACHE_DIR"] = os.getenv('JINJA_BYTECODE_CACHE_DIR') or \
+    os.path.join(app.instance_path, 'jinja_cache')
+
+db = SQLAlchemy(app=app, session_options={'class_': RoutingSession})
+init_routing(db)
+init_profiler(app)
+init_events(app, db)
+init_assets(app)
+init_compression(app)
+init_fragment_cache(app)
 login_manager = LoginManager(app=app)
 login_manager.login_view = 'main.login'
 
 from app import models
+from app.dao import query_cache
 
 @login_manager.user_loader
 def load_user(user_id):
-    from app.models import User
-    return User.query.get(int(user_id))
+    from app.dao import user_dao
+    return user_dao.get_session_user(int(user_id))
 
 from app.index import main_bp
 from app.admin import admin_bp
@@ -1,26 +1,28 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from app.dao import settings_dao, component_dao, invoice_dao, reception_dao, repair_dao
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
+from app.decorators import role_required, conditional_get
+from app.db_routing import REPLICA_BIND, route_blueprint_to_replica
+from app.dao import settings_dao, component_dao, invoice_dao, forecast_dao, query_cache, export_dao
 from app.models import ReceptionSlip, Car, RepairDetail, Component, RepairSlip
-from app import db
+from app import db, db_pool, stock_import, csv_export, events, fragment_cache
 from app.dao.component_dao import ComponentDAO
 from app.dao.settings_dao import SettingsDAO
 from sqlalchemy import func, extract
-from datetime import datetime, timedelta
+from datetime import datetime, date
 import calendar
 
 
 admin_bp = Blueprint('admin', __name__)
+# Dashboard and stock reports are read-heavy; serve admin GET pages from the replica
+route_blueprint_to_replica(admin_bp)
 
 
-def check_admin():
-    return session.get('role') == 'admin'
+admin_required = role_required('admin')
 
 
 @admin_bp.route('/dashboard')
+@admin_required
+@conditional_get('daily_revenue', 'reception_slips', 'cars', 'repair_slips', 'repair_details', 'components', 'system_settings')
 def dashboard():
-    if not check_admin():
-        return redirect(url_for('main.login'))
-
     now = datetime.now()
     filter_day = request.args.get('day', '')
     filter_month = request.args.get('month', now.month)
@@ -75,8 +77,6 @@ def dashboard():
         })
         total_vehicles += count
 
-    from app.models import RepairSlip
-
     category_counts = db.session.query(
         RepairDetail.category,
         func.count(RepairDetail.id).label('count')
@@ -106,10 +106,8 @@ def dashboard():
                            filter_year=filter_year)
 
 @admin_bp.route('/components')
+@admin_required
 def components():
-    if not check_admin():
-        return redirect(url_for('main.login'))
-
     all_components = Component.query.filter_by(is_deleted=False).all()
 
     return render_template(
@@ -120,10 +118,8 @@ def components():
 
 
 @admin_bp.route('/component/add', methods=['POST'])
+@admin_required
 def add_component():
-    if not check_admin():
-        return redirect(url_for('main.login'))
-
     name = request.form['name'].strip()
     current_price = float(request.form['current_price'])
     stock_quantity = int(request.form.get('stock_quantity', 0))
@@ -157,10 +153,8 @@ def add_component():
 
 
 @admin_bp.route('/component/update/<int:component_id>', methods=['POST'])
+@admin_required
 def update_component(component_id):
-    if not check_admin():
-        return redirect(url_for('main.login'))
-    
     name = request.form['name']
     price = float(request.form['price'])
     stock = int(request.form.get('stock', 0))
@@ -172,10 +166,8 @@ def update_component(component_id):
 
 
 @admin_bp.route('/component/delete/<int:component_id>', methods=['POST'])
+@admin_required
 def delete_component(component_id):
-    if not check_admin():
-        return redirect(url_for('main.login'))
-    
     if component_dao.soft_delete_component(component_id):
         flash('Component deleted.')
     else:
@@ -185,33 +177,12 @@ def delete_component(component_id):
 
 
 @admin_bp.route('/accessories')
+@admin_required
+@conditional_get('components', 'repair_details', 'system_settings')
 def accessories():
-    if not check_admin():
-        return redirect(url_for('main.login'))
-
-    components = component_dao.get_all_active()
-
-    component_stats = []
-    for comp in components:
-        used_count = db.session.query(func.count(RepairDetail.id)) \
-            .filter(RepairDetail.component_id == comp.id) \
-            .scalar()
-
-        imported = comp.stock_quantity + used_count
-
-        component_stats.append({
-            'id': comp.id,
-            'code': f'P{str(comp.id).zfill(3)}',
-            'name': comp.name,
-            'imported': imported,
-            'used': used_count,
-            'inventory': comp.stock_quantity,
-            'price': comp.current_price
-        })
-
-    most_used = sorted(component_stats, key=lambda x: x['used'], reverse=True)[:5]
-
-    most_imported = sorted(component_stats, key=lambda x: x['imported'], reverse=True)[:5]
+    component_stats = component_dao.get_usage_stats()
+    most_used = component_dao.get_top_components(by='used', limit=5)
+    most_imported = component_dao.get_top_components(by='imported', limit=5)
 
     total_inventory = sum(c['inventory'] for c in component_stats)
 
@@ -229,10 +200,8 @@ def accessories():
 
 
 @admin_bp.route('/accessories/update-price/<int:component_id>', methods=['POST'])
+@admin_required
 def update_accessory_price(component_id):
-    if not check_admin():
-        return redirect(url_for('main.login'))
-
     try:
         new_price = float(request.form['price'])
         component_dao.update_component(component_id, current_price=new_price)
@@ -244,31 +213,63 @@ def update_accessory_price(component_id):
 
 
 @admin_bp.route('/accessories/batch-update', methods=['POST'])
+@admin_required
 def batch_update_prices():
-    if not check_admin():
-        return redirect(url_for('main.login'))
-
-    updated_count = 0
+    prices = {}
+    invalid = []
     for key, value in request.form.items():
-        if key.startswith('price_'):
-            component_id = int(key.split('_')[1])
-            try:
-                new_price = float(value)
-                if new_price > 0:
-                    component_dao.update_component(component_id, current_price=new_price)
-                    updated_count += 1
-            except ValueError:
-                continue
+        if not key.startswith('price_'):
+            continue
+        value = value.strip()
+        # The form posts every row; only the ones the user actually changed are validated and saved
+        if not value or value == request.form.get(f'original_{key}', '').strip():
+            continue
+        try:
+            prices[int(key.split('_')[1])] = float(value)
+        except ValueError:
+            invalid.append(key.split('_', 1)[1])
+
+    if invalid:
+        flash(f'Invalid price for component(s): {", ".join(invalid)}. No prices were changed.')
+        return redirect(url_for('admin.accessories'))
+
+    try:
+        updated_count = component_dao.bulk_update_prices(prices)
+    except ValueError as e:
+        flash(f'No prices were changed: {"; ".join(e.args[0])}')
+        return redirect(url_for('admin.accessories'))
 
     flash(f'{updated_count} prices updated successfully!')
     return redirect(url_for('admin.accessories'))
 
 
+@admin_bp.route('/accessories/price-rule', methods=['POST'])
+@admin_required
+def apply_price_rule():
+    try:
+        percent = float(request.form.get('percent') or 0)
+        markup = float(request.form.get('markup') or 0)
+        component_ids = [int(i) for i in request.form.getlist('component_id[]') if i]
+        round_to = int(request.form['round_to']) if request.form.get('round_to') else None
+    except ValueError:
+        flash('Invalid price rule!')
+        return redirect(url_for('admin.accessories'))
+
+    name_contains = request.form.get('name_contains', '').strip() or None
+    try:
+        count = component_dao.apply_price_rule(percent, markup, component_ids, name_contains, round_to=round_to,
+                                               all_components=request.form.get('all_components') == '1')
+    except ValueError as e:
+        flash(f'No prices were changed: {e}')
+        return redirect(url_for('admin.accessories'))
+
+    flash(f'{count} prices updated successfully!')
+    return redirect(url_for('admin.accessories'))
+
+
 @admin_bp.route('/vat-settings')
+@admin_required
 def vat_settings():
-    if not check_admin():
-        return redirect(url_for('main.login'))
-
     vat_rate = settings_dao.get_setting_float('vat_rate', 10.0)
     max_cars = settings_dao.get_setting_int('max_cars_per_day', 30)
 
@@ -278,10 +279,8 @@ def vat_settings():
 
 
 @admin_bp.route('/vat-settings/update-vat', methods=['POST'])
+@admin_required
 def update_vat_rate():
-    if not check_admin():
-        return redirect(url_for('main.login'))
-
     try:
         new_vat = float(request.form['vat_rate'])
         if new_vat < 0 or new_vat > 100:
@@ -296,10 +295,8 @@ def update_vat_rate():
 
 
 @admin_bp.route('/vat-settings/update-vehicle-limit', methods=['POST'])
+@admin_required
 def update_vehicle_limit():
-    if not check_admin():
-        return redirect(url_for('main.login'))
-
     try:
         new_limit = int(request.form['max_cars'])
         if new_limit < 1 or new_limit > 1000:
@@ -315,58 +312,25 @@ def update_vehicle_limit():
 
 
 @admin_bp.route('/low-stock-alert')
+@admin_required
 def low_stock_alert():
-    if not check_admin():
-        return redirect(url_for('main.login'))
-
     all_components = Component.query.filter_by(is_deleted=False).all()
 
     threshold = ComponentDAO.get_low_stock_threshold()
     components = ComponentDAO.get_low_stock_components()
 
-    components_data = []
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-
-    for comp in components:
-
-        used = db.session.query(func.sum(RepairDetail.quantity)) \
-            .filter(RepairDetail.component_id == comp.id) \
-            .scalar() or 0
-
-        imported = comp.stock_quantity + used
-
-        recent_usage = db.session.query(func.sum(RepairDetail.quantity)) \
-            .join(RepairSlip, RepairDetail.repair_slip_id == RepairSlip.id) \
-            .filter(
-                RepairDetail.component_id == comp.id,
-                RepairSlip.start_date >= thirty_days_ago
-            ).scalar() or 0
+    components_data = forecast_dao.get_stock_forecast(components)
 
-        if comp.stock_quantity == 0:
-            status = 'out'
-            status_text = 'Out of Stock'
-            status_color = '#DC3545'
+    for comp in components_data:
+        comp['price'] = comp['current_price']
+        if comp['stock_quantity'] == 0:
+            comp['status'] = 'out'
+            comp['status_text'] = 'Out of Stock'
+            comp['status_color'] = '#DC3545'
         else:
-            status = 'low'
-            status_text = 'Low Stock'
-            status_color = '#FFA500'
-
-        components_data.append({
-            'id': comp.id,
-            'name': comp.name,
-
-            'stock_quantity': comp.stock_quantity,
-            'current_price': comp.current_price,
-            'price': comp.current_price,
-
-            'imported': imported,
-            'used': used,
-            'recent_usage': recent_usage,
-
-            'status': status,
-            'status_text': status_text,
-            'status_color': status_color
-        })
+            comp['status'] = 'low'
+            comp['status_text'] = 'Low Stock'
+            comp['status_color'] = '#FFA500'
 
     return render_template(
         'admin/low_stock_alert.html',
@@ -378,21 +342,80 @@ def low_stock_alert():
 
 
 
+@admin_bp.route('/low-stock-forecast')
+@role_required('admin', unauthorized=lambda: ({'success': False, 'message': 'Unauthorized'}, 401))
+def low_stock_forecast():
+    if request.args.get('scope') == 'all':
+        components = forecast_dao.get_all_active_forecast()
+    else:
+        components = forecast_dao.get_stock_forecast(ComponentDAO.get_low_stock_components())
+
+    return {
+        'threshold': ComponentDAO.get_low_stock_threshold(),
+        'components': components
+    }
+
+
 @admin_bp.route('/low-stock-count')
+@role_required('admin', unauthorized=lambda: {'count': 0})
 def low_stock_count():
-    if not check_admin():
-        return {'count': 0}
-
     return {
         'count': ComponentDAO.count_low_stock_components()
     }
 
 
+@admin_bp.route('/events')
+@role_required('admin', unauthorized=lambda: ({'success': False, 'message': 'Unauthorized'}, 401))
+def event_stream():
+    """Server-Sent Events: the low-stock count now and whenever it changes."""
+    return events.stream_response(
+        [component_dao.LOW_STOCK_TOPIC],
+        lambda: [(component_dao.LOW_STOCK_TOPIC, {'count': ComponentDAO.count_low_stock_components()})]
+    )
+
+
+@admin_bp.route('/cache-stats')
+@role_required('admin', unauthorized=lambda: ({'success': False, 'message': 'Unauthorized'}, 401))
+def cache_stats():
+    return dict(query_cache.stats(), fragments=fragment_cache.stats())
+
+
+@admin_bp.route('/pool-stats')
+@role_required('admin', unauthorized=lambda: ({'success': False, 'message': 'Unauthorized'}, 401))
+def pool_stats():
+    stats = db_pool.pool_stats(db.engine)
+    if REPLICA_BIND in db.engines:
+        stats['replica'] = db_pool.pool_stats(db.engines[REPLICA_BIND])
+    return stats
+
+
+@admin_bp.route('/export/<kind>')
+@admin_required
+def export_csv(kind):
+    """Stream invoices, reception slips or repair line items for ?start=YYYY-MM-DD&end=YYYY-MM-DD as CSV."""
+    if kind not in export_dao.EXPORTS:
+        abort(404)
+
+    today = date.today()
+    try:
+        start_date = date.fromisoformat(request.args['start']) if request.args.get('start') else today.replace(day=1)
+        end_date = date.fromisoformat(request.args['end']) if request.args.get('end') else today
+    except ValueError:
+        return {'success': False, 'message': 'Dates must be YYYY-MM-DD'}, 400
+    if end_date < start_date:
+        return {'success': False, 'message': 'End date is before start date'}, 400
+
+    return csv_export.csv_response(
+        f"{kind}_{start_date:%Y%m%d}_{end_date:%Y%m%d}.csv",
+        export_dao.get_export_header(kind),
+        export_dao.stream_export(kind, start_date, end_date),
+        gzip=request.args.get('gzip') == '1'
+    )
+
+
 @admin_bp.route('/update-stock-threshold', methods=['POST'])
+@admin_required
 def update_stock_threshold():
-    if not check_admin():
-        return redirect(url_for('main.login'))
-
     try:
         threshold = int(request.form['threshold'])
         if 0 <= threshold <= 100:
@@ -408,24 +431,40 @@ def update_stock_threshold():
 
 
 @admin_bp.route('/import-components', methods=['POST'])
+@role_required('admin', unauthorized=lambda: {'success': False, 'message': 'Unauthorized'})
 def import_components():
-    if not check_admin():
-        return {'success': False, 'message': 'Unauthorized'}
-
     component_ids = request.form.getlist('component_id[]')
     quantities = request.form.getlist('quantity[]')
 
-    for comp_id, qty in zip(component_ids, quantities):
-        component = Component.query.filter_by(
-            id=int(comp_id),
-            is_deleted=False
-        ).first()
+    increments = {}
+    try:
+        for comp_id, qty in zip(component_ids, quantities):
+            increments[int(comp_id)] = increments.get(int(comp_id), 0) + int(qty)
+    except ValueError:
+        return {'success': False, 'message': 'Invalid component or quantity'}
 
-        if not component:
-            continue
+    missing = component_dao.import_stock(increments)
+    return {'success': True, 'missing': missing}
 
-        component.stock_quantity += int(qty)
 
-    db.session.commit()
-    return {'success': True}
+@admin_bp.route('/import-components/upload', methods=['POST'])
+@role_required('admin', unauthorized=lambda: ({'success': False, 'message': 'Unauthorized'}, 401))
+def upload_import_manifest():
+    upload = request.files.get('file')
+    if upload:
+        stream = upload.stream
+        filename = upload.filename or ''
+    else:
+        stream = request.stream
+        filename = ''
+
+    fmt = request.args.get('format')
+    if not fmt:
+        is_jsonl = filename.endswith(('.jsonl', '.ndjson')) or 'ndjson' in (request.mimetype or '') \
+            or 'jsonl' in (request.mimetype or '')
+        fmt = 'jsonl' if is_jsonl else 'csv'
+
+    result = stock_import.import_manifest(stream, fmt=fmt)
+    result['success'] = result['error_count'] == 0
+    return result
 
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+from flask import current_app, request, url_for
+from markupsafe import Markup
+
+
+MANIFEST = 'dist/manifest.json'
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+# Third-party files committed under static/ and where they came from; build_assets.py
+# --fetch-vendor downloads one again when it is missing (e.g. after bumping a version)
+VENDOR = {
+    'js/vendor/chart.umd.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.2/dist/chart.umd.js',
+}
+
+
+class AssetManifest:
+    """Maps logical static paths (css/style.css) to the fingerprinted files written by build_assets.py.
+
+    Without a manifest every lookup falls back to the plain static file, so a
+    checkout works before the build has ever been run.
+    """
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.path = os.path.join(static_folder, MANIFEST)
+        self._mtime = None
+        self.version = None
+        self.files = {}
+        self.variants = {}
+        self.hashed = set()
+        self.load()
+
+    def load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._mtime = self.version = None
+            self.files, self.variants, self.hashed = {}, {}, set()
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.files = data.get('files', {})
+        self.variants = data.get('variants', {})
+        self.hashed = set(self.files.values())
+        for formats in self.variants.values():
+            self.hashed.update(formats.values())
+        self._mtime = mtime
+        # Changes whenever a build changes what the pages link to
+        self.version = hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+    def refresh(self):
+        # In debug a rebuild shows up without restarting the server
+        if current_app.debug:
+            self.load()
+
+    def url(self, filename):
+        self.refresh()
+        hashed = self.files.get(filename)
+        if hashed:
+            return url_for('static', filename=hashed)
+        return url_for('static', filename=filename)
+
+    def image_variants(self, filename):
+        """[(mime type, url)] of the smaller formats built for an image, best first."""
+        self.refresh()
+        return [(mime, url_for('static', filename=path))
+                for mime, path in self.variants.get(filename, {}).items()]
+
+    def image_set(self, filename):
+        """CSS image-set() value offering the AVIF/WebP variants with the original as fallback."""
+        candidates = self.image_variants(filename) + [(None, self.url(filename))]
+        if len(candidates) == 1:
+            return Markup(f'url("{candidates[0][1]}")')
+        return Markup('image-set(' + ', '.join(
+            f'url("{url}") type("{mime}")' if mime else f'url("{url}")' for mime, url in candidates
+        ) + ')')
+
+
+def init_assets(app):
+    manifest = AssetManifest(app.static_folder)
+    app.extensions['assets'] = manifest
+    app.jinja_env.globals.update(
+        asset_url=manifest.url,
+        asset_variants=manifest.image_variants,
+        asset_image_set=manifest.image_set,
+    )
+
+    @app.after_request
+    def cache_fingerprinted(response):
+        # A fingerprinted file never changes under the same name, so browsers may keep it for a year
+        if request.endpoint == 'static' and response.status_code in (200, 304):
+            filename = (request.view_args or {}).get('filename')
+            if filename in manifest.hashed:
+                response.headers['Cache-Control'] = IMMUTABLE_CACHE
+        return response
+
+    return manifest
@@ -1,51 +1,30 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from app.dao import repair_dao, reception_dao, settings_dao, invoice_dao, component_dao
-from app.models import ReceptionSlip, Car, RepairSlip, RepairDetail
-from app import db
+from app.decorators import role_required, conditional_get
+from app.dao.unit_of_work import unit_of_work
+from app.dao import repair_dao, reception_dao, settings_dao, invoice_dao
 from datetime import datetime
 
 cashier_bp = Blueprint('cashier', __name__)
 
 
-def check_cashier():
-    role = session.get('role')
-    return role in ['cashier', 'admin']
+cashier_required = role_required('cashier', 'admin')
 
 
 @cashier_bp.route('/')
+@cashier_required
+@conditional_get('repair_slips', 'reception_slips', 'cars', 'invoices', 'system_settings')
 def home():
-    if not check_cashier():
-        return redirect(url_for('main.login'))
-
     vat_rate = settings_dao.get_setting_float('vat_rate', 10.0)
 
     filter_status = request.args.get('filter')
     keyword = request.args.get('q')
 
-    query = db.session.query(ReceptionSlip, Car, RepairSlip)\
-        .join(Car, ReceptionSlip.car_id == Car.id)\
-        .join(RepairSlip, ReceptionSlip.id == RepairSlip.reception_slip_id)
-    
-    if filter_status == 'completed':
-        query = query.filter(ReceptionSlip.status == 'completed')
-    elif filter_status == 'paid':
-        query = query.filter(ReceptionSlip.status == 'paid')
-    else:
-        query = query.filter(ReceptionSlip.status.in_(['completed', 'paid']))
-    
-    if keyword:
-        search_term = f"%{keyword}%"
-        query = query.filter(
-            (Car.license_plate.ilike(search_term)) |
-            (Car.owner_name.ilike(search_term))
-        )
-
-    results = query.order_by(RepairSlip.end_date.desc()).all()
+    cursor = request.args.get('cursor')
+    page = repair_dao.get_finished_repairs_page(status=filter_status, keyword=keyword, cursor=cursor)
     
     completed_slips = []
-    for slip, car, repair in results:
-        details = RepairDetail.query.filter_by(repair_slip_id=repair.id).all()
-        subtotal = sum(d.price_at_time * d.quantity + d.labor_fee for d in details)
+    for slip, car, repair in page['items']:
+        subtotal = repair.subtotal
         
         completed_slips.append({
             'id': slip.id,
@@ -72,14 +51,18 @@ def home():
             'license_plate': car.license_plate
         })
     
-    return render_template('cashier/home.html', completed_slips=completed_slips, recent_invoices=recent_invoices, vat_rate=vat_rate, current_filter=filter_status, keyword=keyword)
+    pagination = {
+        'next_cursor': page['next_cursor'],
+        'approx_total': page['approx_total'],
+        'is_first': not cursor
+    }
+    
+    return render_template('cashier/home.html', completed_slips=completed_slips, recent_invoices=recent_invoices, vat_rate=vat_rate, current_filter=filter_status, keyword=keyword, pagination=pagination)
 
 
 @cashier_bp.route('/invoice/<int:repair_id>')
+@cashier_required
 def invoice(repair_id):
-    if not check_cashier():
-        return redirect(url_for('main.login'))
-    
     result = repair_dao.get_repair_by_id(repair_id)
     if not result:
         flash('Repair not found.')
@@ -114,7 +97,7 @@ def invoice(repair_id):
 
     vat_rate = settings_dao.get_setting_float('vat_rate', 10.0)
 
-    subtotal = sum(item['price_at_time'] * item['quantity'] + item['labor_fee'] for item in items)
+    subtotal = repair_slip.subtotal or 0
     vat_amount = float(subtotal) * (vat_rate / 100)
     total_amount = float(subtotal) + vat_amount
     
@@ -126,19 +109,20 @@ def invoice(repair_id):
 
 
 @cashier_bp.route('/pay/<int:repair_id>', methods=['POST'])
+@cashier_required
 def process_payment(repair_id):
     """Process payment and create invoice"""
-    if not check_cashier():
-        return redirect(url_for('main.login'))
-    
-    total_amount = float(request.form['total_amount'])
+    repair = repair_dao.get_repair_only_by_id(repair_id)
+    if not repair:
+        flash('Repair not found.')
+        return redirect(url_for('cashier.home'))
 
     vat_rate = settings_dao.get_setting_float('vat_rate', 10.0)
+    subtotal = float(repair.subtotal or 0)
+    total_amount = subtotal + subtotal * (vat_rate / 100)
 
-    invoice_dao.create_invoice(repair_id, session['user_id'], total_amount, vat_rate)
-
-    repair = repair_dao.get_repair_only_by_id(repair_id)
-    if repair:
+    with unit_of_work():
+        invoice_dao.create_invoice(repair_id, session['user_id'], total_amount, vat_rate)
         reception_dao.update_slip_status(repair.reception_slip_id, 'paid')
     
     flash('Payment processed successfully!')
@@ -0,0 +1,91 @@
+import gzip
+import mimetypes
+import os
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Sibling file build_assets.py writes next to a static file, per Content-Encoding
+PRECOMPRESSED = {'br': '.br', 'gzip': '.gz'}
+
+DEFAULT_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'image/svg+xml',
+)
+
+
+def available_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate_encoding():
+    """The best encoding the client accepts, br before gzip on a tie; None for identity."""
+    if not request.accept_encodings:
+        return None
+    return request.accept_encodings.best_match(available_encodings())
+
+
+def compressible(mimetype):
+    return mimetype in current_app.config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=current_app.config.get('COMPRESS_BR_QUALITY', 4))
+    return gzip.compress(data, compresslevel=current_app.config.get('COMPRESS_LEVEL', 6), mtime=0)
+
+
+def _compress_response(response):
+    if not compressible(response.mimetype):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    # Streamed bodies (CSV exports, event streams) and files are left alone: they are
+    # either already compressed, must not be buffered, or have a precompressed sibling
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or (response.content_length or 0) < current_app.config.get('COMPRESS_MIN_SIZE', 1024)):
+        return response
+
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # A strong ETag names exact bytes, so the compressed body needs its own
+        response.set_etag(f"{etag}-{encoding}")
+    return response
+
+
+def _precompressed_static(static_view, static_folder):
+    def static(filename):
+        mimetype = mimetypes.guess_type(filename)[0]
+        encoding = negotiate_encoding() if mimetype and compressible(mimetype) else None
+        if encoding:
+            sibling = filename + PRECOMPRESSED[encoding]
+            if os.path.isfile(os.path.join(static_folder, sibling)):
+                response = send_from_directory(static_folder, sibling, mimetype=mimetype,
+                                               max_age=current_app.get_send_file_max_age(filename))
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+        response = static_view(filename=filename)
+        if mimetype and compressible(mimetype):
+            response.vary.add('Accept-Encoding')
+        return response
+
+    return static
+
+
+def init_compression(app):
+    """gzip/brotli for dynamic responses, and precompressed .br/.gz siblings for static files."""
+    if app.has_static_folder:
+        app.view_functions['static'] = _precompressed_static(app.view_functions['static'], app.static_folder)
+    app.after_request(_compress_response)
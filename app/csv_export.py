@@ -0,0 +1,63 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from flask import Response, stream_with_context
+
+
+CHUNK_SIZE = 64 * 1024
+# Spreadsheets run a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _format(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip('0').rstrip('.') if value != int(value) else str(int(value))
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Owner names, descriptions etc. are typed by users; show them as text, never evaluate them
+        return "'" + value
+    return value
+
+
+def iter_csv(header, rows):
+    """CSV text in chunks of about CHUNK_SIZE characters, so large exports are sent as they are read."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the Vietnamese names as UTF-8
+    buffer.write('﻿')
+    writer.writerow([_format(v) for v in header])
+    for row in rows:
+        writer.writerow([_format(v) for v in row])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_gzip(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def csv_response(filename, header, rows, gzip=False):
+    """Streaming CSV download; with gzip=True the body is a .csv.gz file compressed on the fly."""
+    chunks = iter_csv(header, rows)
+    if gzip:
+        body, mimetype, filename = iter_gzip(chunks), 'application/gzip', filename + '.gz'
+    else:
+        body, mimetype = (chunk.encode('utf-8') for chunk in chunks), 'text/csv; charset=utf-8'
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    # Tell nginx not to buffer the whole file before passing it on
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,5 +1,6 @@
 from app.models import Car
 from app import db
+from app.dao import search_dao, unit_of_work
 
 
 def get_car_by_plate(license_plate):
@@ -21,7 +22,8 @@ def create_car(license_plate, owner_name, phone_number=None, address=None, email
         color=color
     )
     db.session.add(car)
-    db.session.commit()
+    search_dao.index_car(car)
+    unit_of_work.commit()
     return car
 
 
@@ -40,7 +42,8 @@ def update_car(car_id, owner_name=None, phone_number=None, address=None, email=N
             car.vehicle_type = vehicle_type
         if color is not None:
             car.color = color
-        db.session.commit()
+        search_dao.index_car(car)
+        unit_of_work.commit()
     return car
 
 
@@ -1,16 +1,22 @@
-from app.models import Component
+from app.models import Component, RepairDetail
 from app.dao.settings_dao import SettingsDAO
-from app import db
+from app.dao.query_cache import cached_query, on_table_commit
+from app import db, events
+from app.dao import unit_of_work
+from sqlalchemy import func, case, update
 
 
+@cached_query('components')
 def get_all_active():
     return Component.query.filter(Component.is_deleted == False).all()
 
 
+@cached_query('components')
 def get_all_components():
     return Component.query.filter_by(is_deleted=False).all()
 
 
+@cached_query('components')
 def get_component_by_id(component_id):
     return Component.query.get(component_id)
 
@@ -23,7 +29,7 @@ def add_component(name, current_price, stock_quantity=0):
         is_deleted=False
     )
     db.session.add(component)
-    db.session.commit()
+    unit_of_work.commit()
     return component
 
 
@@ -36,7 +42,7 @@ def update_component(component_id, name=None, current_price=None, stock_quantity
             component.current_price = current_price
         if stock_quantity is not None:
             component.stock_quantity = stock_quantity
-        db.session.commit()
+        unit_of_work.commit()
     return component
 
 
@@ -44,10 +50,148 @@ def soft_delete_component(component_id):
     component = Component.query.get(component_id)
     if component:
         component.is_deleted = True
-        db.session.commit()
+        unit_of_work.commit()
         return True
     return False
 
+def import_stock(quantities, commit=True):
+    """Add stock for many components: one IN query to validate, one UPDATE to apply.
+
+    quantities maps component_id -> quantity to add. Returns the ids that were not
+    found (or are deleted); those rows are skipped.
+    """
+    if not quantities:
+        return []
+
+    ids = list(quantities)
+    existing = {row[0] for row in db.session.query(Component.id).filter(
+        Component.id.in_(ids),
+        Component.is_deleted == False
+    ).all()}
+
+    if existing:
+        increment = case({component_id: quantities[component_id] for component_id in existing},
+                         value=Component.id, else_=0)
+        Component.query.filter(
+            Component.id.in_(existing),
+            Component.is_deleted == False
+        ).update({Component.stock_quantity: Component.stock_quantity + increment}, synchronize_session=False)
+
+    if commit:
+        unit_of_work.commit()
+    return [component_id for component_id in ids if component_id not in existing]
+
+
+def bulk_update_prices(prices):
+    """Validate every new price first, then apply them all in one executemany UPDATE and one commit.
+
+    prices maps component_id -> new price. Raises ValueError listing every bad row and
+    changes nothing if any row is invalid. Returns the number of prices that changed.
+    """
+    errors = []
+    for component_id, price in prices.items():
+        if price is None or price <= 0:
+            errors.append(f'{component_id}: price must be greater than 0')
+
+    current = dict(db.session.query(Component.id, Component.current_price).filter(
+        Component.id.in_(list(prices)),
+        Component.is_deleted == False
+    ).all()) if prices else {}
+
+    errors.extend(f'{component_id}: component not found' for component_id in prices if component_id not in current)
+    if errors:
+        raise ValueError(errors)
+
+    changes = [{'id': component_id, 'current_price': price}
+               for component_id, price in prices.items() if current[component_id] != price]
+    if changes:
+        db.session.execute(update(Component), changes)
+    unit_of_work.commit()
+    return len(changes)
+
+
+def apply_price_rule(percent=0, markup=0, component_ids=None, name_contains=None, round_to=None,
+                     all_components=False):
+    """Reprice in one UPDATE: price * (1 + percent/100) + markup, evaluated in SQL.
+
+    The rule applies to the given ids and/or names containing name_contains; repricing
+    every active component needs all_components=True. round_to (e.g. 1000) rounds the new
+    prices. Raises ValueError for a rule that changes nothing or has no scope. Returns
+    the number of components repriced.
+    """
+    if not percent and not markup:
+        raise ValueError('Enter a percentage or an amount to add')
+    if round_to is not None and round_to <= 0:
+        raise ValueError('Rounding must be a positive amount')
+    if not component_ids and not name_contains and not all_components:
+        raise ValueError('Choose components by name or confirm the rule applies to all components')
+
+    new_price = Component.current_price * (1 + percent / 100.0) + markup
+    if round_to:
+        new_price = func.round(new_price / round_to, 0) * round_to
+
+    query = Component.query.filter(Component.is_deleted == False)
+    if component_ids:
+        query = query.filter(Component.id.in_(component_ids))
+    if name_contains:
+        query = query.filter(Component.name.contains(name_contains, autoescape=True))
+
+    count = query.filter(new_price > 0).update({Component.current_price: new_price}, synchronize_session=False)
+    unit_of_work.commit()
+    return count
+
+
+def _usage_stats_query():
+    usage = db.session.query(
+        RepairDetail.component_id.label('component_id'),
+        func.count(RepairDetail.id).label('used')
+    ).group_by(RepairDetail.component_id).subquery()
+
+    used = func.coalesce(usage.c.used, 0)
+    imported = Component.stock_quantity + used
+
+    query = db.session.query(
+        Component.id,
+        Component.name,
+        Component.current_price,
+        Component.stock_quantity,
+        used.label('used'),
+        imported.label('imported')
+    ).outerjoin(usage, usage.c.component_id == Component.id)\
+        .filter(Component.is_deleted == False)
+
+    return query, {'used': used, 'imported': imported, 'inventory': Component.stock_quantity}
+
+
+@cached_query('components', 'repair_details')
+def get_usage_stats(order_by=None, limit=None):
+    """Used / imported / inventory figures for every active component in one grouped query.
+
+    order_by may be 'used', 'imported' or 'inventory' (descending); limit gives a top-N list.
+    """
+    query, sort_columns = _usage_stats_query()
+
+    if order_by:
+        query = query.order_by(sort_columns[order_by].desc(), Component.id.asc())
+    else:
+        query = query.order_by(Component.id.asc())
+
+    if limit:
+        query = query.limit(limit)
+
+    return [{
+        'id': r.id,
+        'code': f'P{str(r.id).zfill(3)}',
+        'name': r.name,
+        'imported': int(r.imported or 0),
+        'used': int(r.used),
+        'inventory': r.stock_quantity or 0,
+        'price': r.current_price
+    } for r in query.all()]
+
+
+def get_top_components(by='used', limit=5):
+    return get_usage_stats(order_by=by, limit=limit)
 
 
 class ComponentDAO:
@@ -69,9 +213,30 @@ class ComponentDAO:
         ).order_by(Component.stock_quantity.asc()).all()
 
     @staticmethod
+    @cached_query('components', 'system_settings')
     def count_low_stock_components():
         threshold = ComponentDAO.get_low_stock_threshold()
         return Component.query.filter(
             Component.is_deleted == False,
             Component.stock_quantity <= threshold
         ).count()
+
+
+LOW_STOCK_TOPIC = 'low_stock'
+
+
+def publish_low_stock_count():
+    if events.hub.has_subscribers(LOW_STOCK_TOPIC):
+        events.publish(LOW_STOCK_TOPIC, {'count': ComponentDAO.count_low_stock_components()})
+
+
+def _low_stock_inputs_changed():
+    # Stock or threshold changed; recount once at the end of the request, and only if someone listens
+    events.run_after_request(LOW_STOCK_TOPIC, publish_low_stock_count)
+
+
+on_table_commit('components', _low_stock_inputs_changed)
+on_table_commit('system_settings', _low_stock_inputs_changed)
+# Changes committed by other worker processes
+events.watch_tables(LOW_STOCK_TOPIC, ('components', 'system_settings'),
+                    lambda: {'count': ComponentDAO.count_low_stock_components()})
@@ -0,0 +1,96 @@
+from app.models import Invoice, RepairSlip, ReceptionSlip, RepairDetail, Car, Component, User
+from app import db
+from app.db_routing import read_replica
+from sqlalchemy import select, func
+from sqlalchemy.orm import aliased
+from datetime import datetime, timedelta
+
+
+YIELD_PER = 1000
+
+
+def _date_range(column, start_date, end_date):
+    # Half-open datetime range so the index on the column can be used
+    return (column >= datetime.combine(start_date, datetime.min.time()),
+            column < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+
+
+def _stream(statement):
+    """Plain rows from a server-side cursor, YIELD_PER at a time; nothing is kept in the session."""
+    result = db.session.execute(statement.execution_options(yield_per=YIELD_PER))
+    try:
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        result.close()
+
+
+def _invoices(start_date, end_date):
+    cashier = aliased(User)
+    return select(
+        Invoice.id, Invoice.created_at, Invoice.repair_slip_id,
+        Car.license_plate, Car.owner_name, cashier.username,
+        Invoice.payment_method, Invoice.vat_rate, Invoice.total_amount
+    ).join(RepairSlip, Invoice.repair_slip_id == RepairSlip.id)\
+        .join(ReceptionSlip, RepairSlip.reception_slip_id == ReceptionSlip.id)\
+        .join(Car, ReceptionSlip.car_id == Car.id)\
+        .outerjoin(cashier, Invoice.cashier_id == cashier.id)\
+        .where(*_date_range(Invoice.created_at, start_date, end_date))\
+        .order_by(Invoice.created_at.asc(), Invoice.id.asc())
+
+
+def _reception_slips(start_date, end_date):
+    return select(
+        ReceptionSlip.id, ReceptionSlip.reception_date, ReceptionSlip.status,
+        Car.license_plate, Car.owner_name, Car.phone_number, Car.vehicle_type,
+        ReceptionSlip.description
+    ).join(Car, ReceptionSlip.car_id == Car.id)\
+        .where(*_date_range(ReceptionSlip.reception_date, start_date, end_date))\
+        .order_by(ReceptionSlip.reception_date.asc(), ReceptionSlip.id.asc())
+
+
+def _repair_details(start_date, end_date):
+    technician = aliased(User)
+    return select(
+        RepairDetail.id, RepairDetail.repair_slip_id, RepairSlip.start_date, RepairSlip.end_date,
+        Car.license_plate, technician.username, Component.name, RepairDetail.category,
+        RepairDetail.quantity, RepairDetail.price_at_time, RepairDetail.labor_fee,
+        RepairDetail.price_at_time * RepairDetail.quantity + func.coalesce(RepairDetail.labor_fee, 0)
+    ).join(RepairSlip, RepairDetail.repair_slip_id == RepairSlip.id)\
+        .join(ReceptionSlip, RepairSlip.reception_slip_id == ReceptionSlip.id)\
+        .join(Car, ReceptionSlip.car_id == Car.id)\
+        .outerjoin(technician, RepairSlip.technician_id == technician.id)\
+        .outerjoin(Component, RepairDetail.component_id == Component.id)\
+        .where(*_date_range(RepairSlip.start_date, start_date, end_date))\
+        .order_by(RepairDetail.repair_slip_id.asc(), RepairDetail.id.asc())
+
+
+EXPORTS = {
+    'invoices': (
+        ['invoice_id', 'created_at', 'repair_id', 'license_plate', 'owner_name', 'cashier',
+         'payment_method', 'vat_rate', 'total_amount'],
+        _invoices
+    ),
+    'reception-slips': (
+        ['slip_id', 'reception_date', 'status', 'license_plate', 'owner_name', 'phone_number',
+         'vehicle_type', 'description'],
+        _reception_slips
+    ),
+    'repair-details': (
+        ['detail_id', 'repair_id', 'start_date', 'end_date', 'license_plate', 'technician',
+         'component', 'category', 'quantity', 'price_at_time', 'labor_fee', 'line_total'],
+        _repair_details
+    ),
+}
+
+
+def get_export_header(kind):
+    return EXPORTS[kind][0]
+
+
+def stream_export(kind, start_date, end_date):
+    """Rows of one export kind, streamed; only one batch is held in memory at a time."""
+    _, build = EXPORTS[kind]
+    # Inside the generator (not a decorator) so the replica is used while rows are read
+    with read_replica():
+        yield from _stream(build(start_date, end_date))
@@ -0,0 +1,146 @@
+from app.models import Component, RepairDetail, RepairSlip
+from app import db
+from app.db_routing import read_only
+from sqlalchemy import func
+from datetime import datetime, date, timedelta
+import math
+import numpy as np
+
+
+HISTORY_DAYS = 90
+ROLLING_WINDOW = 30
+EWMA_SPAN = 14
+LEAD_TIME_DAYS = 7
+COVER_DAYS = 30
+SAFETY_Z = 1.65
+
+
+def _to_date(value):
+    # func.date() gives a date on MySQL and an ISO string on SQLite
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+@read_only
+def get_total_usage(component_ids):
+    if not component_ids:
+        return {}
+
+    results = db.session.query(
+        RepairDetail.component_id,
+        func.sum(RepairDetail.quantity)
+    ).filter(
+        RepairDetail.component_id.in_(component_ids)
+    ).group_by(RepairDetail.component_id).all()
+
+    return {component_id: int(total or 0) for component_id, total in results}
+
+
+@read_only
+def get_daily_usage_matrix(component_ids, days=HISTORY_DAYS, today=None):
+    """Daily consumption as a (components x days) array, oldest day first, loaded in one query."""
+    today = today or date.today()
+    start = today - timedelta(days=days - 1)
+    matrix = np.zeros((len(component_ids), days), dtype=float)
+    if not component_ids:
+        return matrix
+
+    day = func.date(RepairSlip.start_date)
+    results = db.session.query(
+        RepairDetail.component_id,
+        day.label('day'),
+        func.sum(RepairDetail.quantity).label('quantity')
+    ).join(RepairSlip, RepairDetail.repair_slip_id == RepairSlip.id)\
+        .filter(
+            RepairDetail.component_id.in_(component_ids),
+            RepairSlip.start_date >= datetime.combine(start, datetime.min.time())
+        ).group_by(RepairDetail.component_id, day).all()
+
+    row_index = {component_id: i for i, component_id in enumerate(component_ids)}
+    rows, cols, values = [], [], []
+    for r in results:
+        col = (_to_date(r.day) - start).days
+        if 0 <= col < days:
+            rows.append(row_index[r.component_id])
+            cols.append(col)
+            values.append(float(r.quantity or 0))
+
+    np.add.at(matrix, (np.array(rows, dtype=int), np.array(cols, dtype=int)), values)
+    return matrix
+
+
+def compute_forecast(usage, stock, window=ROLLING_WINDOW, span=EWMA_SPAN,
+                     lead_time=LEAD_TIME_DAYS, cover_days=COVER_DAYS, safety_z=SAFETY_Z):
+    """Vectorised usage rates and reorder figures for every component at once.
+
+    usage is a (components x days) array of daily consumption, stock the matching
+    on-hand quantities. Returns a dict of per-component arrays.
+    """
+    stock = np.asarray(stock, dtype=float)
+    window = min(window, usage.shape[1])
+
+    recent = usage[:, -window:]
+    recent_usage = recent.sum(axis=1)
+    rolling_rate = recent_usage / window if window else np.zeros(len(stock))
+
+    alpha = 2.0 / (span + 1)
+    weights = (1 - alpha) ** np.arange(usage.shape[1])[::-1]
+    ewma_rate = usage @ weights / weights.sum() if usage.shape[1] else np.zeros(len(stock))
+
+    # Use the more pessimistic of the two so a recent spike is not averaged away
+    daily_rate = np.maximum(rolling_rate, ewma_rate)
+    daily_std = recent.std(axis=1) if window else np.zeros(len(stock))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_left = np.where(daily_rate > 0, stock / daily_rate, np.inf)
+
+    safety_stock = safety_z * daily_std * np.sqrt(lead_time)
+    target = daily_rate * (lead_time + cover_days) + safety_stock
+    reorder = np.maximum(np.ceil(target - stock), 0)
+
+    return {
+        'recent_usage': recent_usage,
+        'rolling_rate': rolling_rate,
+        'ewma_rate': ewma_rate,
+        'daily_rate': daily_rate,
+        'days_until_stockout': days_left,
+        'reorder_quantity': reorder
+    }
+
+
+@read_only
+def get_stock_forecast(components, today=None):
+    """Forecast rows for the given Component objects using a constant number of queries."""
+    component_ids = [c.id for c in components]
+    used = get_total_usage(component_ids)
+    usage = get_daily_usage_matrix(component_ids, today=today)
+    forecast = compute_forecast(usage, [c.stock_quantity or 0 for c in components])
+
+    rows = []
+    for i, comp in enumerate(components):
+        days_left = forecast['days_until_stockout'][i]
+        rows.append({
+            'id': comp.id,
+            'name': comp.name,
+            'stock_quantity': comp.stock_quantity,
+            'current_price': comp.current_price,
+            'used': used.get(comp.id, 0),
+            'imported': (comp.stock_quantity or 0) + used.get(comp.id, 0),
+            'recent_usage': int(forecast['recent_usage'][i]),
+            'rolling_rate': round(float(forecast['rolling_rate'][i]), 3),
+            'ewma_rate': round(float(forecast['ewma_rate'][i]), 3),
+            'daily_rate': round(float(forecast['daily_rate'][i]), 3),
+            'days_until_stockout': None if math.isinf(days_left) else round(float(days_left), 1),
+            'reorder_quantity': int(forecast['reorder_quantity'][i])
+        })
+    return rows
+
+
+@read_only
+def get_all_active_forecast(today=None):
+    components = Component.query.filter(Component.is_deleted == False)\
+        .order_by(Component.id.asc()).all()
+    return get_stock_forecast(components, today=today)
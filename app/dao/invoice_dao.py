@@ -1,19 +1,52 @@
-from app.models import Invoice, RepairSlip, ReceptionSlip, Car
+from app.models import Invoice, RepairSlip, ReceptionSlip, Car, DailyRevenue
 from app import db
-from sqlalchemy import func, extract
-from datetime import datetime
+from app.dao import unit_of_work
+from app.dao.query_cache import cached_query
+from app.db_routing import read_only
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, date, timedelta
+import calendar
 
 
-def create_invoice(repair_slip_id, cashier_id, total_amount, vat_rate):
+def _add_to_daily_revenue(revenue_date, payment_method, amount):
+    row_filter = (
+        DailyRevenue.revenue_date == revenue_date,
+        DailyRevenue.payment_method == payment_method
+    )
+    increment = {
+        DailyRevenue.total_amount: DailyRevenue.total_amount + amount,
+        DailyRevenue.invoice_count: DailyRevenue.invoice_count + 1
+    }
+
+    if DailyRevenue.query.filter(*row_filter).update(increment, synchronize_session=False):
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(DailyRevenue(
+                revenue_date=revenue_date,
+                payment_method=payment_method,
+                total_amount=amount,
+                invoice_count=1
+            ))
+    except IntegrityError:
+        # Another cashier created the day's row first
+        DailyRevenue.query.filter(*row_filter).update(increment, synchronize_session=False)
+
+
+def create_invoice(repair_slip_id, cashier_id, total_amount, vat_rate, payment_method='cash'):
     invoice = Invoice(
         repair_slip_id=repair_slip_id,
         cashier_id=cashier_id,
         total_amount=total_amount,
         vat_rate=vat_rate,
+        payment_method=payment_method,
         created_at=datetime.now()
     )
     db.session.add(invoice)
-    db.session.commit()
+    _add_to_daily_revenue(invoice.created_at.date(), payment_method, total_amount)
+    unit_of_work.commit()
     return invoice
 
 
@@ -21,6 +54,7 @@ def get_invoice_by_repair_id(repair_id):
     return Invoice.query.filter(Invoice.repair_slip_id == repair_id).first()
 
 
+@cached_query('invoices', 'repair_slips', 'reception_slips', 'cars')
 def get_recent_invoices(limit=10):
     return db.session.query(Invoice, Car)\
         .join(RepairSlip, Invoice.repair_slip_id == RepairSlip.id)\
@@ -31,26 +65,68 @@ def get_recent_invoices(limit=10):
         .all()
 
 
-def get_revenue_by_month(month, year):
-    results = db.session.query(
-        extract('day', Invoice.created_at).label('day'),
-        func.sum(Invoice.total_amount).label('total')
+def _month_range(month, year):
+    _, num_days = calendar.monthrange(year, month)
+    return date(year, month, 1), date(year, month, num_days)
+
+
+@cached_query('daily_revenue')
+def get_revenue_by_range(start_date, end_date, payment_method=None):
+    query = db.session.query(
+        DailyRevenue.revenue_date,
+        func.sum(DailyRevenue.total_amount).label('total')
     ).filter(
-        extract('month', Invoice.created_at) == month,
-        extract('year', Invoice.created_at) == year
-    ).group_by(
-        extract('day', Invoice.created_at)
-    ).all()
-    
-    return {int(r.day): float(r.total) for r in results}
+        DailyRevenue.revenue_date >= start_date,
+        DailyRevenue.revenue_date <= end_date
+    )
+
+    if payment_method:
+        query = query.filter(DailyRevenue.payment_method == payment_method)
 
+    results = query.group_by(DailyRevenue.revenue_date).all()
+    return {r.revenue_date: float(r.total) for r in results}
 
+
+def get_revenue_by_month(month, year):
+    start_date, end_date = _month_range(month, year)
+    revenue = get_revenue_by_range(start_date, end_date)
+    return {d.day: total for d, total in revenue.items()}
+
+
+@read_only
 def get_total_revenue_by_month(month, year):
+    start_date, end_date = _month_range(month, year)
     result = db.session.query(
-        func.sum(Invoice.total_amount).label('total')
+        func.sum(DailyRevenue.total_amount).label('total')
     ).filter(
-        extract('month', Invoice.created_at) == month,
-        extract('year', Invoice.created_at) == year
+        DailyRevenue.revenue_date >= start_date,
+        DailyRevenue.revenue_date <= end_date
     ).first()
-    
+
     return float(result.total) if result.total else 0.0
+
+
+def rebuild_daily_revenue(start_date=None, end_date=None):
+    """Recompute daily_revenue from invoices, for all days or an inclusive date range."""
+    invoice_day = func.date(Invoice.created_at)
+    payment_method = func.coalesce(Invoice.payment_method, 'cash')
+    source = select(
+        invoice_day,
+        payment_method,
+        func.sum(Invoice.total_amount),
+        func.count(Invoice.id)
+    ).group_by(invoice_day, payment_method)
+
+    delete_query = DailyRevenue.query
+    if start_date:
+        source = source.where(Invoice.created_at >= datetime.combine(start_date, datetime.min.time()))
+        delete_query = delete_query.filter(DailyRevenue.revenue_date >= start_date)
+    if end_date:
+        source = source.where(Invoice.created_at < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        delete_query = delete_query.filter(DailyRevenue.revenue_date <= end_date)
+
+    delete_query.delete(synchronize_session=False)
+    db.session.execute(insert(DailyRevenue).from_select(
+        ['revenue_date', 'payment_method', 'total_amount', 'invoice_count'], source
+    ))
+    unit_of_work.commit()
@@ -0,0 +1,89 @@
+from app import app
+from sqlalchemy import and_, or_
+from datetime import datetime
+import time
+
+
+COUNT_TTL = 60
+# Cursor position of a row whose sort value is NULL
+NULL_SORT_VALUE = 'null'
+
+_count_cache = {}
+
+
+def get_page_size():
+    return app.config.get('PAGE_SIZE', 10)
+
+
+def encode_cursor(sort_value, row_id):
+    if sort_value is None:
+        return f"{NULL_SORT_VALUE}_{row_id}"
+    return f"{sort_value.isoformat()}_{row_id}"
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        sort_value, row_id = cursor.rsplit('_', 1)
+        if sort_value == NULL_SORT_VALUE:
+            return None, int(row_id)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except ValueError:
+        return None
+
+
+def keyset_page(query, sort_column, id_column, cursor=None, limit=None, row_key=None):
+    """Fetch one page ordered by (sort_column, id_column) descending, seeking past the cursor.
+
+    row_key(row) must return the (sort_value, id) of a result row; the next cursor is built from
+    the last row, so page N costs the same index range scan as page 1.
+
+    Rows with a NULL sort value come last (MySQL and SQLite sort NULL lowest), ordered by id.
+    """
+    limit = limit or get_page_size()
+    position = decode_cursor(cursor)
+
+    if position:
+        sort_value, row_id = position
+        if sort_value is None:
+            query = query.filter(sort_column.is_(None), id_column < row_id)
+        else:
+            query = query.filter(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < row_id),
+                sort_column.is_(None)
+            ))
+
+    rows = query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*row_key(rows[-1]))
+
+    return rows, next_cursor
+
+
+def approximate_count(cache_key, query):
+    """COUNT(*) of the query, cached for COUNT_TTL seconds.
+
+    Only for the fixed list views (cache_key from a small, known set): a keyword search
+    would count every match on each new keyword, so those pages show no total at all.
+    """
+    now = time.monotonic()
+    cached = _count_cache.get(cache_key)
+    if cached and now - cached[1] < COUNT_TTL:
+        return cached[0]
+
+    total = query.order_by(None).count()
+    _count_cache[cache_key] = (total, now)
+    return total
+
+
+def make_page(items, next_cursor, approx_total):
+    return {
+        'items': items,
+        'next_cursor': next_cursor,
+        'approx_total': approx_total
+    }
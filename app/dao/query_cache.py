@@ -0,0 +1,267 @@
+from app import app, db
+from app.models import TableVersion
+from app.db_routing import primary
+from flask import g, has_request_context
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.base import NO_VALUE
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.elements import TextClause
+from collections import OrderedDict
+from functools import wraps
+import logging
+import re
+import sys
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+VERSION_TABLE = TableVersion.__tablename__
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+_commit_callbacks = {}
+_stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'bytes': 0}
+
+# Target table of a raw text() write
+_TEXT_WRITE = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?(?:\s+IGNORE)?\s+INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+[`"\[]?(\w+)',
+    re.IGNORECASE
+)
+
+
+# --- table version tracking -------------------------------------------------
+
+def _dirty_tables(session):
+    return session.info.setdefault('dirty_tables', set())
+
+
+@event.listens_for(db.session, 'after_flush')
+def _track_flush(session, flush_context):
+    dirty = _dirty_tables(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = inspect(obj).mapper.local_table.name
+        if table != VERSION_TABLE:
+            dirty.add(table)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _track_bulk_write(orm_execute_state):
+    statement = orm_execute_state.statement
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        table = getattr(statement, 'table', None)
+        name = table.name if table is not None else None
+    elif isinstance(statement, TextClause):
+        match = _TEXT_WRITE.match(statement.text)
+        name = match.group(1) if match else None
+    else:
+        return
+    if name and name != VERSION_TABLE:
+        _dirty_tables(orm_execute_state.session).add(name)
+
+
+@event.listens_for(db.session, 'before_commit')
+def _collect_dirty_tables(session):
+    # Releasing a savepoint makes nothing visible yet; the outer commit picks its writes up
+    if session.in_nested_transaction():
+        return
+    session.flush()
+    dirty = session.info.pop('dirty_tables', None)
+    if dirty:
+        session.info['committed_tables'] = dirty
+
+
+@event.listens_for(db.session, 'after_commit')
+def _bump_committed_versions(session):
+    if session.in_nested_transaction():
+        return
+    committed = session.info.pop('committed_tables', None)
+    if not committed:
+        return
+
+    # The rows are visible now; bumping afterwards means no reader can cache them under the old version
+    from app.dao import version_dao
+    try:
+        version_dao.bump_versions(committed)
+    except SQLAlchemyError:
+        logger.exception('could not bump table versions for %s', ', '.join(sorted(committed)))
+
+    if has_request_context():
+        g.pop('_table_versions', None)
+    for table in committed:
+        for callback in _commit_callbacks.get(table, []):
+            callback()
+
+
+def has_uncommitted_writes(tables):
+    """True if the current session has written to any of tables in a transaction not yet committed."""
+    return bool(_dirty_tables(db.session()).intersection(tables))
+
+
+def on_table_commit(table, callback):
+    """Call callback() in this process after any commit that wrote to table."""
+    _commit_callbacks.setdefault(table, []).append(callback)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_dirty_tables(session, previous_transaction):
+    # A savepoint rollback leaves the outer transaction's writes in place
+    if not previous_transaction.nested and not session.in_transaction():
+        session.info.pop('dirty_tables', None)
+
+
+def current_versions(tables):
+    """Version of each table, read at most once per request (and again after a commit)."""
+    from app.dao import version_dao
+    memo = None
+    if has_request_context():
+        memo = g.setdefault('_table_versions', {})
+        missing = [t for t in tables if t not in memo]
+        if missing:
+            memo.update(version_dao.get_versions(missing))
+        return tuple(memo[t] for t in tables)
+
+    versions = version_dao.get_versions(tables)
+    return tuple(versions[t] for t in tables)
+
+
+# --- cache storage ----------------------------------------------------------
+
+def _estimate_size(value):
+    if isinstance(value, (list, tuple, Row)):
+        return sys.getsizeof(value) + sum(_estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    if hasattr(value, '_sa_instance_state'):
+        state_dict = inspect(value).dict
+        return 200 + sum(sys.getsizeof(v) for v in state_dict.values())
+    return sys.getsizeof(value)
+
+
+def _snapshot(value):
+    # Cache a copy of the loaded column values; the caller's own instances stay in its session untouched
+    if isinstance(value, list):
+        return [_snapshot(v) for v in value]
+    if isinstance(value, (tuple, Row)):
+        return tuple(_snapshot(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _snapshot(v) for k, v in value.items()}
+    if hasattr(value, '_sa_instance_state'):
+        state = inspect(value)
+        copy = state.mapper.class_manager.new_instance()
+        for attr in state.mapper.column_attrs:
+            # committed_state holds the database value of an attribute edited but not yet flushed
+            loaded = state.committed_state.get(attr.key, state.dict.get(attr.key, NO_VALUE))
+            if loaded is not NO_VALUE:
+                set_committed_value(copy, attr.key, loaded)
+        make_transient_to_detached(copy)
+        return copy
+    return value
+
+
+def _attach(value):
+    # Hand each caller its own copies, merged into the current session without a SELECT
+    if isinstance(value, list):
+        return [_attach(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_attach(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _attach(v) for k, v in value.items()}
+    if hasattr(value, '_sa_instance_state'):
+        return db.session.merge(value, load=False)
+    return value
+
+
+def _store(key, versions, value):
+    size = _estimate_size(value)
+    max_bytes = app.config.get('QUERY_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+    max_entries = app.config.get('QUERY_CACHE_MAX_ENTRIES', 1024)
+    if size > max_bytes:
+        return
+
+    with _lock:
+        old = _entries.pop(key, None)
+        if old:
+            _stats['bytes'] -= old[2]
+        _entries[key] = (versions, value, size)
+        _stats['bytes'] += size
+
+        while len(_entries) > max_entries or _stats['bytes'] > max_bytes:
+            _, (_, _, evicted_size) = _entries.popitem(last=False)
+            _stats['bytes'] -= evicted_size
+            _stats['evictions'] += 1
+
+
+def _lookup(key, versions):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats['misses'] += 1
+            return None
+        if entry[0] != versions:
+            _entries.pop(key)
+            _stats['bytes'] -= entry[2]
+            _stats['stale'] += 1
+            _stats['misses'] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats['hits'] += 1
+        return entry
+
+
+def cached_query(*tables):
+    """Cache a DAO read by function and arguments until one of the given tables is written."""
+    tables = tuple(sorted(tables))
+
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not app.config.get('QUERY_CACHE_ENABLED', True):
+                return fn(*args, **kwargs)
+
+            key = (name, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return fn(*args, **kwargs)
+
+            # Uncommitted writes in this session must not leak into (or be served stale from) the cache
+            if has_uncommitted_writes(tables):
+                return fn(*args, **kwargs)
+
+            versions = current_versions(tables)
+            entry = _lookup(key, versions)
+            if entry is not None:
+                return _attach(entry[1])
+
+            # Fill from the primary: a lagging replica would pin stale rows to the new version
+            with primary():
+                result = fn(*args, **kwargs)
+            # An autoflush inside fn may have written to one of the tables
+            if not has_uncommitted_writes(tables):
+                _store(key, versions, _snapshot(result))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _stats['bytes'] = 0
+
+
+def stats():
+    with _lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return dict(_stats,
+                    entries=len(_entries),
+                    hit_ratio=round(_stats['hits'] / lookups, 3) if lookups else 0.0)
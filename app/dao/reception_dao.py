@@ -1,21 +1,102 @@
-from app.models import ReceptionSlip, Car
-from app import db
-from sqlalchemy import func
-from datetime import datetime, date
+from app.models import ReceptionSlip, Car, DailyCapacity, RepairSlip, User
+from app import db, events
+from app.dao import pagination, search_dao, unit_of_work
+from app.db_routing import read_only
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, date, timedelta
 
 
-def get_all_slips(keyword=None):
+QUEUE_TOPIC = 'queue'
+QUEUE_STATUSES = ('pending', 'waiting', 'repairing')
+
+
+class DailyLimitReached(Exception):
+    pass
+
+
+def queue_row(slip, car, repair=None, technician=None):
+    return {
+        'slip_id': slip.id,
+        'status': slip.status,
+        'license_plate': car.license_plate,
+        'owner_name': car.owner_name,
+        'vehicle_type': car.vehicle_type,
+        'reception_date': slip.reception_date.isoformat(timespec='seconds') if slip.reception_date else None,
+        'repair_id': repair.id if repair else None,
+        'technician': technician,
+        'start_date': repair.start_date.isoformat(timespec='seconds') if repair and repair.start_date else None
+    }
+
+
+def _queue_query():
+    return db.session.query(ReceptionSlip, Car, RepairSlip, User.full_name)\
+        .join(Car, ReceptionSlip.car_id == Car.id)\
+        .outerjoin(RepairSlip, RepairSlip.reception_slip_id == ReceptionSlip.id)\
+        .outerjoin(User, RepairSlip.technician_id == User.id)
+
+
+def get_queue_snapshot():
+    """Open slips (waiting for or under repair) for the live queue board, oldest first, in one query."""
+    rows = _queue_query()\
+        .filter(ReceptionSlip.status.in_(QUEUE_STATUSES))\
+        .order_by(ReceptionSlip.reception_date.asc(), ReceptionSlip.id.asc())\
+        .all()
+    return [queue_row(slip, car, repair, technician) for slip, car, repair, technician in rows]
+
+
+def get_queue_row(slip_id):
+    result = _queue_query().filter(ReceptionSlip.id == slip_id).first()
+    return queue_row(*result) if result else None
+
+
+def queue_event(kind, **data):
+    """Announce a queue change (added, status, claimed, finished) to live pages once the transaction commits."""
+    events.publish_on_commit(QUEUE_TOPIC, {'type': kind, **data})
+
+
+def _queue_event(kind, slip):
+    db.session.flush()
+    if kind == 'added':
+        queue_event(kind, row=queue_row(slip, db.session.get(Car, slip.car_id)), slip_id=slip.id, status=slip.status)
+    elif slip.status in QUEUE_STATUSES:
+        # The slip may be entering the board (e.g. back from completed), so send the whole row
+        queue_event(kind, row=get_queue_row(slip.id), slip_id=slip.id, status=slip.status)
+    else:
+        queue_event(kind, slip_id=slip.id, status=slip.status)
+
+
+# Changes committed by other worker processes: the boards get a fresh snapshot
+events.watch_tables(QUEUE_TOPIC, ('reception_slips', 'repair_slips', 'cars', 'users'),
+                    get_queue_snapshot, event='snapshot')
+
+
+def _slips_query(keyword=None):
     query = db.session.query(ReceptionSlip, Car)\
         .join(Car, ReceptionSlip.car_id == Car.id)
 
     if keyword:
-        search_term = f"%{keyword}%"
-        query = query.filter(
-            (Car.license_plate.ilike(search_term)) |
-            (Car.owner_name.ilike(search_term))
-        )
+        query = query.filter(search_dao.car_search_condition(keyword))
+
+    return query
 
-    return query.order_by(ReceptionSlip.reception_date.desc()).all()
+
+def get_all_slips(keyword=None):
+    return _slips_query(keyword).order_by(ReceptionSlip.reception_date.desc()).all()
+
+
+@read_only
+def get_slips_page(keyword=None, cursor=None, limit=None):
+    query = _slips_query(keyword)
+
+    rows, next_cursor = pagination.keyset_page(
+        query, ReceptionSlip.reception_date, ReceptionSlip.id,
+        cursor=cursor, limit=limit,
+        row_key=lambda row: (row[0].reception_date, row[0].id)
+    )
+    approx_total = None if keyword else pagination.approximate_count(('reception_slips',), query)
+
+    return pagination.make_page(rows, next_cursor, approx_total)
 
 
 def get_slip_by_id(slip_id):
@@ -29,15 +110,51 @@ def get_slip_only_by_id(slip_id):
     return ReceptionSlip.query.get(slip_id)
 
 
-def create_slip(car_id, description=None, status='pending'):
+def reserve_slot(day, max_cars):
+    """Take one of the day's max_cars intake slots, or raise DailyLimitReached; the caller commits.
+
+    The conditional UPDATE locks the day's row until commit, so two receptionists
+    cannot both take the last slot.
+    """
+    reserved = DailyCapacity.query.filter(
+        DailyCapacity.capacity_date == day,
+        DailyCapacity.slip_count < max_cars
+    ).update({DailyCapacity.slip_count: DailyCapacity.slip_count + 1}, synchronize_session=False)
+    if reserved:
+        return
+
+    if db.session.get(DailyCapacity, day) is None and max_cars > 0:
+        try:
+            with db.session.begin_nested():
+                db.session.add(DailyCapacity(capacity_date=day, slip_count=1))
+            return
+        except IntegrityError:
+            # Another receptionist opened the day first; compete for a slot in their row
+            reserved = DailyCapacity.query.filter(
+                DailyCapacity.capacity_date == day,
+                DailyCapacity.slip_count < max_cars
+            ).update({DailyCapacity.slip_count: DailyCapacity.slip_count + 1}, synchronize_session=False)
+            if reserved:
+                return
+
+    raise DailyLimitReached(max_cars)
+
+
+def create_slip(car_id, description=None, status='pending', max_cars=None):
+    """Insert a slip; with max_cars the day's intake slot is reserved in the same transaction."""
+    reception_date = datetime.now()
+    if max_cars is not None:
+        reserve_slot(reception_date.date(), max_cars)
+
     slip = ReceptionSlip(
         car_id=car_id,
         description=description,
         status=status,
-        reception_date=datetime.now()
+        reception_date=reception_date
     )
     db.session.add(slip)
-    db.session.commit()
+    _queue_event('added', slip)
+    unit_of_work.commit()
     return slip
 
 
@@ -48,25 +165,46 @@ def update_slip(slip_id, car_id=None, description=None, status=None):
             slip.car_id = car_id
         if description is not None:
             slip.description = description
-        if status is not None:
+        if status is not None and status != slip.status:
             slip.status = status
-        db.session.commit()
+            _queue_event('status', slip)
+        unit_of_work.commit()
     return slip
 
 
 def update_slip_status(slip_id, status):
     slip = ReceptionSlip.query.get(slip_id)
     if slip:
-        slip.status = status
-        db.session.commit()
+        if slip.status != status:
+            slip.status = status
+            _queue_event('status', slip)
+        unit_of_work.commit()
     return slip
 
 
 def count_today_slips():
-    today = date.today()
-    return ReceptionSlip.query.filter(
-        func.date(ReceptionSlip.reception_date) == today
-    ).count()
+    count = db.session.query(DailyCapacity.slip_count)\
+        .filter(DailyCapacity.capacity_date == date.today())\
+        .scalar()
+    return count or 0
+
+
+def rebuild_daily_capacity(start_date=None, end_date=None):
+    """Recount daily_capacity from reception_slips, for all days or an inclusive date range."""
+    slip_day = func.date(ReceptionSlip.reception_date)
+    source = select(slip_day, func.count(ReceptionSlip.id)).group_by(slip_day)
+
+    delete_query = DailyCapacity.query
+    if start_date:
+        source = source.where(ReceptionSlip.reception_date >= datetime.combine(start_date, datetime.min.time()))
+        delete_query = delete_query.filter(DailyCapacity.capacity_date >= start_date)
+    if end_date:
+        source = source.where(ReceptionSlip.reception_date < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        delete_query = delete_query.filter(DailyCapacity.capacity_date <= end_date)
+
+    delete_query.delete(synchronize_session=False)
+    db.session.execute(insert(DailyCapacity).from_select(['capacity_date', 'slip_count'], source))
+    unit_of_work.commit()
 
 
 def get_slips_by_status(statuses):
@@ -1,8 +1,24 @@
-from app.models import RepairSlip, RepairDetail, ReceptionSlip, Car, Component
+from app.models import RepairSlip, RepairDetail, ReceptionSlip, Car, Component, User
 from app import db
+from app.dao import pagination, search_dao, unit_of_work, reception_dao
+from app.db_routing import read_only
+from sqlalchemy import func
 from datetime import datetime
 
 
+def _line_total(detail):
+    return (detail.price_at_time or 0) * (detail.quantity or 0) + (detail.labor_fee or 0)
+
+
+def _adjust_totals(repair_slip_id, subtotal=0, item_count=0, labor_total=0):
+    # Single UPDATE so concurrent edits on the same slip don't lose increments
+    RepairSlip.query.filter(RepairSlip.id == repair_slip_id).update({
+        RepairSlip.subtotal: func.coalesce(RepairSlip.subtotal, 0) + subtotal,
+        RepairSlip.item_count: func.coalesce(RepairSlip.item_count, 0) + item_count,
+        RepairSlip.labor_total: func.coalesce(RepairSlip.labor_total, 0) + labor_total
+    }, synchronize_session='fetch')
+
+
 def create_repair_slip(reception_slip_id, technician_id):
     repair = RepairSlip(
         reception_slip_id=reception_slip_id,
@@ -10,7 +26,12 @@ def create_repair_slip(reception_slip_id, technician_id):
         start_date=datetime.now()
     )
     db.session.add(repair)
-    db.session.commit()
+    db.session.flush()
+    technician = db.session.get(User, technician_id) if technician_id else None
+    reception_dao.queue_event('claimed', slip_id=reception_slip_id, repair_id=repair.id,
+                              technician=technician.full_name if technician else None,
+                              start_date=repair.start_date.isoformat(timespec='seconds'))
+    unit_of_work.commit()
     return repair
 
 
@@ -40,15 +61,36 @@ def get_repairs_by_technician(technician_id, status=None, keyword=None):
         query = query.filter(ReceptionSlip.status == status)
 
     if keyword:
-        search_term = f"%{keyword}%"
-        query = query.filter(
-            (Car.license_plate.ilike(search_term)) |
-            (Car.owner_name.ilike(search_term))
-        )
+        query = query.filter(search_dao.car_search_condition(keyword))
     
     return query.order_by(RepairSlip.start_date.desc()).all()
 
 
+@read_only
+def get_finished_repairs_page(status=None, keyword=None, cursor=None, limit=None):
+    query = db.session.query(ReceptionSlip, Car, RepairSlip)\
+        .join(Car, ReceptionSlip.car_id == Car.id)\
+        .join(RepairSlip, ReceptionSlip.id == RepairSlip.reception_slip_id)
+
+    if status in ['completed', 'paid']:
+        query = query.filter(ReceptionSlip.status == status)
+    else:
+        status = None
+        query = query.filter(ReceptionSlip.status.in_(['completed', 'paid']))
+
+    if keyword:
+        query = query.filter(search_dao.car_search_condition(keyword))
+
+    rows, next_cursor = pagination.keyset_page(
+        query, RepairSlip.end_date, RepairSlip.id,
+        cursor=cursor, limit=limit,
+        row_key=lambda row: (row[2].end_date, row[2].id)
+    )
+    approx_total = None if keyword else pagination.approximate_count(('finished_repairs', status), query)
+
+    return pagination.make_page(rows, next_cursor, approx_total)
+
+
 def get_repair_details(repair_id):
     return db.session.query(RepairDetail, Component)\
         .outerjoin(Component, RepairDetail.component_id == Component.id)\
@@ -70,7 +112,8 @@ def add_repair_detail(repair_slip_id, component_id, quantity, price_at_time, cat
         labor_fee=labor_fee
     )
     db.session.add(detail)
-    db.session.commit()
+    _adjust_totals(repair_slip_id, _line_total(detail), 1, detail.labor_fee or 0)
+    unit_of_work.commit()
     return detail
 
 
@@ -81,6 +124,8 @@ def get_repair_detail_by_id(detail_id):
 def update_repair_detail(detail_id, component_id=None, quantity=None, price_at_time=None, category=None, labor_fee=None):
     detail = RepairDetail.query.get(detail_id)
     if detail:
+        old_total = _line_total(detail)
+        old_labor = detail.labor_fee or 0
         if component_id is not None:
             detail.component_id = component_id
         if quantity is not None:
@@ -91,7 +136,8 @@ def update_repair_detail(detail_id, component_id=None, quantity=None, price_at_t
             detail.category = category
         if labor_fee is not None:
             detail.labor_fee = labor_fee
-        db.session.commit()
+        _adjust_totals(detail.repair_slip_id, _line_total(detail) - old_total, 0, (detail.labor_fee or 0) - old_labor)
+        unit_of_work.commit()
     return detail
 
 
@@ -99,8 +145,9 @@ def delete_repair_detail(detail_id):
     detail = RepairDetail.query.get(detail_id)
     if detail:
         repair_slip_id = detail.repair_slip_id
+        _adjust_totals(repair_slip_id, -_line_total(detail), -1, -(detail.labor_fee or 0))
         db.session.delete(detail)
-        db.session.commit()
+        unit_of_work.commit()
         return repair_slip_id
     return None
 
@@ -109,5 +156,29 @@ def finish_repair(repair_id):
     repair = RepairSlip.query.get(repair_id)
     if repair:
         repair.end_date = datetime.now()
-        db.session.commit()
+        reception_dao.queue_event('finished', slip_id=repair.reception_slip_id, repair_id=repair.id,
+                                  end_date=repair.end_date.isoformat(timespec='seconds'))
+        unit_of_work.commit()
     return repair
+
+
+def _detail_sum(column):
+    return db.session.query(column)\
+        .filter(RepairDetail.repair_slip_id == RepairSlip.id)\
+        .scalar_subquery()
+
+
+def recalculate_repair_totals(repair_id=None):
+    """Rebuild the stored totals from repair_details, e.g. to backfill existing slips."""
+    line_total = RepairDetail.price_at_time * RepairDetail.quantity + func.coalesce(RepairDetail.labor_fee, 0)
+
+    query = RepairSlip.query
+    if repair_id is not None:
+        query = query.filter(RepairSlip.id == repair_id)
+
+    query.update({
+        RepairSlip.subtotal: _detail_sum(func.coalesce(func.sum(line_total), 0)),
+        RepairSlip.item_count: _detail_sum(func.count(RepairDetail.id)),
+        RepairSlip.labor_total: _detail_sum(func.coalesce(func.sum(RepairDetail.labor_fee), 0))
+    }, synchronize_session=False)
+    unit_of_work.commit()
@@ -0,0 +1,239 @@
+from app.models import Car
+from app import db
+from app.dao import unit_of_work
+from sqlalchemy import Integer, column, false, or_, text, update
+import re
+import unicodedata
+
+
+SEARCH_LIMIT = 200
+FTS_TABLE = 'cars_fts'
+FULLTEXT_INDEX = 'ft_cars_search'
+
+
+def normalize_plate(value):
+    return re.sub(r'[^0-9A-Za-z]', '', value or '').upper()
+
+
+def normalize_text(value):
+    value = (value or '').replace('đ', 'd').replace('Đ', 'D')
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(value.lower().split())
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def _min_token_length():
+    # MySQL's ngram parser indexes 2-grams by default, SQLite's FTS5 trigram tokenizer 3-grams
+    return 2 if _dialect() == 'mysql' else 3
+
+
+_ready_binds = set()
+
+
+def search_index_ready():
+    """Whether ensure_search_index() has run on this database; only a yes is remembered."""
+    bind = db.session.get_bind()
+    key = str(bind.url)
+    if key in _ready_binds:
+        return True
+
+    dialect = bind.dialect.name
+    if dialect == 'mysql':
+        exists = db.session.execute(text(
+            "SELECT COUNT(*) FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'cars' AND INDEX_NAME = :name"
+        ), {'name': FULLTEXT_INDEX}).scalar()
+    elif dialect == 'sqlite':
+        exists = db.session.execute(text(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = :name"
+        ), {'name': FTS_TABLE}).scalar()
+    else:
+        exists = False
+
+    if exists:
+        _ready_binds.add(key)
+    return bool(exists)
+
+
+def ensure_search_index():
+    """Create the full-text index over owner names and plates if it does not exist yet."""
+    dialect = _dialect()
+    if dialect == 'mysql':
+        if not search_index_ready():
+            db.session.execute(text(
+                f"ALTER TABLE cars ADD FULLTEXT INDEX {FULLTEXT_INDEX} "
+                f"(owner_name, plate_normalized) WITH PARSER ngram"
+            ))
+    elif dialect == 'sqlite':
+        db.session.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(car_id UNINDEXED, owner_name, plate, tokenize='trigram')"
+        ))
+    unit_of_work.commit()
+
+
+def index_car(car):
+    """Refresh the search columns of one car; the caller commits."""
+    car.plate_normalized = normalize_plate(car.license_plate)
+    # Databases created with db.create_all() have no FTS table until rebuild_search_index() runs
+    if _dialect() != 'sqlite' or not search_index_ready():
+        return
+
+    if car.id is None:
+        db.session.flush()
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE car_id = :car_id"), {'car_id': car.id})
+    db.session.execute(text(
+        f"INSERT INTO {FTS_TABLE} (car_id, owner_name, plate) VALUES (:car_id, :owner_name, :plate)"
+    ), {'car_id': car.id, 'owner_name': normalize_text(car.owner_name), 'plate': car.plate_normalized})
+
+
+def rebuild_search_index(batch_size=1000):
+    """Backfill normalized plates and the SQLite FTS table for every car, a batch of cars at a time."""
+    ensure_search_index()
+    sqlite = _dialect() == 'sqlite'
+    if sqlite:
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+
+    last_id = 0
+    while True:
+        cars = db.session.query(Car.id, Car.license_plate, Car.owner_name)\
+            .filter(Car.id > last_id)\
+            .order_by(Car.id.asc())\
+            .limit(batch_size).all()
+        if not cars:
+            break
+
+        plates = {car.id: normalize_plate(car.license_plate) for car in cars}
+        db.session.execute(update(Car), [
+            {'id': car_id, 'plate_normalized': plate} for car_id, plate in plates.items()
+        ])
+        if sqlite:
+            db.session.execute(text(
+                f"INSERT INTO {FTS_TABLE} (car_id, owner_name, plate) VALUES (:car_id, :owner_name, :plate)"
+            ), [{'car_id': car.id, 'owner_name': normalize_text(car.owner_name), 'plate': plates[car.id]}
+                for car in cars])
+        last_id = cars[-1].id
+    unit_of_work.commit()
+
+
+def _fts_phrase(keyword):
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def _full_text_terms(keyword):
+    """(owner name term, plate term) normalized the way each indexed column is, or None when too short."""
+    min_length = _min_token_length()
+    name = normalize_text(keyword) if _dialect() == 'sqlite' else keyword
+    plate = normalize_plate(keyword)
+    return (name if len(name) >= min_length else None,
+            plate if len(plate) >= min_length else None)
+
+
+def _full_text_query(keyword):
+    """(SQL selecting matching car ids, params, SQL ranking them), or None when nothing can be matched."""
+    name, plate = _full_text_terms(keyword)
+    if not name and not plate:
+        return None
+
+    if _dialect() == 'sqlite':
+        terms = []
+        if name:
+            terms.append(f"owner_name : {_fts_phrase(name)}")
+        if plate:
+            terms.append(f"plate : {_fts_phrase(plate)}")
+        select = f"SELECT car_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q"
+        return select, {'q': ' OR '.join(terms)}, select + " ORDER BY rank"
+
+    # Boolean mode without operators: a car matching either phrase is returned
+    against = ' '.join(_fts_phrase(term) for term in (name, plate) if term)
+    select = "SELECT id FROM cars WHERE MATCH(owner_name, plate_normalized) AGAINST (:q IN BOOLEAN MODE)"
+    return select, {'q': against}, \
+        select + " ORDER BY MATCH(owner_name, plate_normalized) AGAINST (:q) DESC"
+
+
+def _like_condition(keyword):
+    search_term = f"%{keyword}%"
+    conditions = [Car.license_plate.ilike(search_term), Car.owner_name.ilike(search_term)]
+    plate = normalize_plate(keyword)
+    if plate:
+        conditions.append(Car.plate_normalized.contains(plate, autoescape=True))
+    return or_(*conditions)
+
+
+def car_search_condition(keyword):
+    """WHERE condition on Car matching every car the keyword finds, for filtering list pages.
+
+    Unlike search_car_ids() there is no limit, so slip lists and their totals see every match.
+    """
+    keyword = (keyword or '').strip()
+    if not keyword:
+        return false()
+    if _dialect() not in ('sqlite', 'mysql') or not search_index_ready():
+        return _like_condition(keyword)
+
+    conditions = []
+    plate = normalize_plate(keyword)
+    if plate:
+        conditions.append(Car.plate_normalized.startswith(plate))
+    query = _full_text_query(keyword)
+    if query is not None:
+        select, params, _ = query
+        conditions.append(Car.id.in_(text(select).bindparams(**params).columns(column('id', Integer))))
+    elif len(keyword) < _min_token_length():
+        conditions.append(Car.owner_name.startswith(keyword, autoescape=True))
+    return or_(*conditions) if conditions else false()
+
+
+def _full_text_ids(keyword, limit):
+    if _dialect() not in ('sqlite', 'mysql') or not search_index_ready():
+        rows = db.session.query(Car.id).filter(_like_condition(keyword)).limit(limit)
+        return [row[0] for row in rows]
+
+    query = _full_text_query(keyword)
+    if query is None:
+        return []
+    _, params, ranked = query
+    rows = db.session.execute(text(ranked + " LIMIT :limit"), dict(params, limit=limit))
+    return [row[0] for row in rows]
+
+
+def search_car_ids(keyword, limit=SEARCH_LIMIT):
+    """At most limit car ids, best first: exact plate, plate prefix, then full-text matches.
+
+    For suggestions; list filters use car_search_condition() so no match is cut off.
+    """
+    keyword = (keyword or '').strip()
+    if not keyword:
+        return []
+
+    ids = []
+    plate = normalize_plate(keyword)
+    if plate:
+        exact = db.session.query(Car.id).filter(Car.plate_normalized == plate).all()
+        prefix = db.session.query(Car.id)\
+            .filter(Car.plate_normalized.startswith(plate))\
+            .order_by(Car.plate_normalized.asc())\
+            .limit(limit).all()
+        ids.extend(row[0] for row in exact + prefix)
+
+    if len(keyword) >= _min_token_length():
+        ids.extend(_full_text_ids(keyword, limit))
+    else:
+        ids.extend(row[0] for row in db.session.query(Car.id)
+                   .filter(Car.owner_name.startswith(keyword, autoescape=True))
+                   .limit(limit).all())
+
+    return list(dict.fromkeys(ids))[:limit]
+
+
+def search_cars(keyword, limit=SEARCH_LIMIT):
+    ids = search_car_ids(keyword, limit)
+    if not ids:
+        return []
+
+    cars = {car.id: car for car in Car.query.filter(Car.id.in_(ids)).all()}
+    return [cars[car_id] for car_id in ids if car_id in cars]
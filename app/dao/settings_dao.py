@@ -1,10 +1,74 @@
 from app.models import SystemSetting
 from app import db
+from app.dao import version_dao, unit_of_work
+from app.dao.query_cache import has_uncommitted_writes, on_table_commit
+from flask import g, has_request_context
+import threading
 
 
-def get_setting(key):
+VERSION_KEY = 'system_settings'
+
+# Process-wide copy of every setting, reloaded when the shared version counter moves
+_cache = {'version': None, 'values': None}
+_cache_lock = threading.Lock()
+
+
+def _request_memo():
+    if not has_request_context():
+        return None
+    if '_settings_memo' not in g:
+        g._settings_memo = {}
+    return g._settings_memo
+
+
+def _load_settings():
+    # Values written in the open transaction must not be cached under the committed version
+    if has_uncommitted_writes([VERSION_KEY]):
+        return {s.setting_key: s.setting_value for s in SystemSetting.query.all()}
+
+    memo = _request_memo()
+    if memo is not None and 'values' in memo:
+        return memo['values']
+
+    version = version_dao.get_version(VERSION_KEY)
+    with _cache_lock:
+        if _cache['values'] is None or _cache['version'] != version:
+            _cache['values'] = {s.setting_key: s.setting_value for s in SystemSetting.query.all()}
+            _cache['version'] = version
+        values = _cache['values']
+
+    if memo is not None:
+        memo['values'] = values
+    return values
+
+
+def invalidate_cache():
+    with _cache_lock:
+        _cache['values'] = None
+        _cache['version'] = None
+    memo = _request_memo()
+    if memo is not None:
+        memo.clear()
+
+
+# Runs after query_cache has bumped the version, for writes from any code path
+on_table_commit(VERSION_KEY, invalidate_cache)
+
+
+def _save_setting(key, value):
     setting = SystemSetting.query.filter_by(setting_key=key).first()
-    return setting.setting_value if setting else None
+    if setting:
+        setting.setting_value = value
+    else:
+        setting = SystemSetting(setting_key=key, setting_value=value)
+        db.session.add(setting)
+    # Inside a unit of work this only flushes; the cache is dropped once the real commit lands
+    unit_of_work.commit()
+    return setting
+
+
+def get_setting(key):
+    return _load_settings().get(key)
 
 
 def get_setting_int(key, default=0):
@@ -18,34 +82,19 @@ def get_setting_float(key, default=0.0):
 
 
 def set_setting(key, value):
-    setting = SystemSetting.query.filter_by(setting_key=key).first()
-    if setting:
-        setting.setting_value = str(value)
-    else:
-        setting = SystemSetting(setting_key=key, setting_value=str(value))
-        db.session.add(setting)
-    db.session.commit()
-    return setting
+    return _save_setting(key, str(value))
 
 def get_all_settings():
-    settings = SystemSetting.query.all()
-    return {s.setting_key: s.setting_value for s in settings}
+    return dict(_load_settings())
 
 
 class SettingsDAO:
 
     @staticmethod
     def get_setting(key, default=None):
-        setting = SystemSetting.query.filter_by(setting_key=key).first()
-        return setting.setting_value if setting else default
+        value = _load_settings().get(key)
+        return value if value is not None else default
 
     @staticmethod
     def set_setting(key, value):
-        setting = SystemSetting.query.filter_by(setting_key=key).first()
-        if setting:
-            setting.setting_value = value
-        else:
-            setting = SystemSetting(setting_key=key, setting_value=value)
-            db.session.add(setting)
-
-        db.session.commit()
\ No newline at end of file
+        _save_setting(key, value)
@@ -0,0 +1,33 @@
+from app import db
+from contextlib import contextmanager
+
+
+def in_unit_of_work():
+    return db.session.info.get('uow_depth', 0) > 0
+
+
+def commit():
+    """Commit, or only flush when running inside unit_of_work() so the outer scope commits once."""
+    if in_unit_of_work():
+        db.session.flush()
+    else:
+        db.session.commit()
+
+
+@contextmanager
+def unit_of_work():
+    """Group several DAO writes into one transaction: commit once at the end, roll back on error.
+
+    Nested scopes join the outermost one. Usable as a `with` block or a view decorator.
+    """
+    session = db.session
+    session.info['uow_depth'] = session.info.get('uow_depth', 0) + 1
+    try:
+        yield session
+        if session.info['uow_depth'] == 1:
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.info['uow_depth'] -= 1
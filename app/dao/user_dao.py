@@ -1,5 +1,57 @@
 from app.models import User
-from app import db
+from app import db, app
+from app.dao.query_cache import cached_query, on_table_commit
+from flask_login import UserMixin
+import threading
+import time
+
+
+class SessionUser(UserMixin):
+    """Detached, read-only snapshot of a user for Flask-Login's current_user."""
+
+    def __init__(self, id, username, role, full_name):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.full_name = full_name
+
+    def __str__(self):
+        return self.username
+
+
+_session_users = {}
+_session_users_lock = threading.Lock()
+
+
+def invalidate_session_users():
+    with _session_users_lock:
+        _session_users.clear()
+
+
+# Writes committed by this worker drop the cache at once; other workers catch up within the TTL
+on_table_commit('users', invalidate_session_users)
+
+
+def get_session_user(user_id):
+    ttl = app.config.get('USER_CACHE_TTL', 30)
+    now = time.monotonic()
+
+    with _session_users_lock:
+        cached = _session_users.get(user_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    row = db.session.query(User.id, User.username, User.role, User.full_name)\
+        .filter(User.id == user_id)\
+        .first()
+    user = SessionUser(row.id, row.username, row.role, row.full_name) if row else None
+
+    with _session_users_lock:
+        if user:
+            _session_users[user_id] = (now + ttl, user)
+        else:
+            _session_users.pop(user_id, None)
+    return user
 
 
 def get_user_by_id(user_id):
@@ -13,9 +65,11 @@ def auth_user(username, password):
     ).first()
 
 
+@cached_query('users')
 def get_all_users():
     return User.query.all()
 
 
+@cached_query('users')
 def get_users_by_role(role):
     return User.query.filter(User.role == role).all()
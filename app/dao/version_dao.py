@@ -0,0 +1,47 @@
+from app.models import TableVersion
+from app import db
+from app.db_routing import primary
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+
+
+@primary()
+def get_version(table_name):
+    version = db.session.query(TableVersion.version)\
+        .filter(TableVersion.table_name == table_name)\
+        .scalar()
+    return version or 0
+
+
+@primary()
+def get_versions(table_names):
+    rows = db.session.query(TableVersion.table_name, TableVersion.version)\
+        .filter(TableVersion.table_name.in_(table_names))\
+        .all()
+    versions = dict.fromkeys(table_names, 0)
+    versions.update({name: version for name, version in rows})
+    return versions
+
+
+def bump_versions(table_names):
+    """Increment the tables' version counters on the primary, each in its own short transaction.
+
+    Called after the writing transaction has committed, so no counter row stays locked
+    while the rest of a request runs, and two writers never wait on each other's counters.
+    """
+    table = TableVersion.__table__
+    with db.engine.connect() as connection:
+        for table_name in sorted(table_names):
+            updated = connection.execute(
+                update(table).where(table.c.table_name == table_name).values(version=table.c.version + 1)
+            ).rowcount
+            if not updated:
+                try:
+                    connection.execute(insert(table).values(table_name=table_name, version=1))
+                except IntegrityError:
+                    # Another process created the row first
+                    connection.rollback()
+                    connection.execute(
+                        update(table).where(table.c.table_name == table_name).values(version=table.c.version + 1)
+                    )
+            connection.commit()
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from collections import deque
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+def _env(name, cast, default=None):
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    if cast is bool:
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return cast(value)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits and how many connections it opens.
+
+    The numbers live on the pool itself, so the primary and the replica engine each
+    report their own.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.telemetry.record_wait(time.perf_counter() - start)
+
+    def _create_connection(self):
+        record = super()._create_connection()
+        self.telemetry.record_created()
+        return record
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep counting where the old one left off
+        pool = super().recreate()
+        pool.telemetry = self.telemetry
+        return pool
+
+
+def engine_options_from_env(database_uri):
+    """SQLALCHEMY_ENGINE_OPTIONS built from DB_POOL_* / DB_ISOLATION_LEVEL environment variables."""
+    url = make_url(database_uri)
+    options = {}
+
+    isolation_level = _env('DB_ISOLATION_LEVEL', str)
+    if isolation_level:
+        options['isolation_level'] = isolation_level
+
+    # In-memory SQLite keeps a single shared connection; pool sizing does not apply
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+
+    options['poolclass'] = InstrumentedQueuePool
+    options['pool_size'] = _env('DB_POOL_SIZE', int, 5)
+    options['max_overflow'] = _env('DB_MAX_OVERFLOW', int, 10)
+    options['pool_timeout'] = _env('DB_POOL_TIMEOUT', float, 30)
+    options['pool_pre_ping'] = _env('DB_POOL_PRE_PING', bool, True)
+    options['pool_recycle'] = _env('DB_POOL_RECYCLE', int, 3600)
+    return options
+
+
+WINDOW_SECONDS = 60
+
+
+class PoolTelemetry:
+    """Running totals plus one bucket per second for the last WINDOW_SECONDS, so memory stays fixed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {'created': 0, 'checkouts': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+        # [second, connections created, checkouts, wait total, wait max]
+        self._buckets = deque(maxlen=WINDOW_SECONDS)
+
+    def _bucket(self):
+        second = int(time.monotonic())
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0, 0.0, 0.0])
+        return self._buckets[-1]
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self._totals['checkouts'] += 1
+            self._totals['wait_total'] += seconds
+            self._totals['wait_max'] = max(self._totals['wait_max'], seconds)
+            bucket = self._bucket()
+            bucket[2] += 1
+            bucket[3] += seconds
+            bucket[4] = max(bucket[4], seconds)
+
+    def record_created(self):
+        with self._lock:
+            self._totals['created'] += 1
+            self._bucket()[1] += 1
+
+    def stats(self):
+        now = int(time.monotonic())
+        with self._lock:
+            totals = dict(self._totals)
+            recent = [b for b in self._buckets if now - b[0] < WINDOW_SECONDS]
+        checkouts = sum(b[2] for b in recent)
+        return {
+            'connections_created_total': totals['created'],
+            'connections_created_last_minute': sum(b[1] for b in recent),
+            'checkouts_total': totals['checkouts'],
+            'wait_avg_ms': round(totals['wait_total'] / totals['checkouts'] * 1000, 3) if totals['checkouts'] else 0.0,
+            'wait_max_ms': round(totals['wait_max'] * 1000, 3),
+            'wait_last_minute_avg_ms': round(sum(b[3] for b in recent) / checkouts * 1000, 3) if checkouts else 0.0,
+            'wait_last_minute_max_ms': round(max((b[4] for b in recent), default=0.0) * 1000, 3)
+        }
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {'pool_class': type(pool).__name__}
+    telemetry = getattr(pool, 'telemetry', None)
+    if telemetry is not None:
+        stats.update(telemetry.stats())
+
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'timeout': pool.timeout()
+        })
+    return stats
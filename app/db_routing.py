@@ -0,0 +1,112 @@
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_request_context, request, session as http_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+
+REPLICA_BIND = 'replica'
+STICKY_SECONDS = 5
+_STICKY_KEY = '_primary_until'
+
+
+class RoutingSession(Session):
+    """Sends SELECTs marked read-only to the replica bind; everything else goes to the primary.
+
+    Reads stay on the primary when no replica is configured, while flushing, after this
+    session has written, or for a few seconds after the same browser session wrote
+    (read-your-writes).
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if self.info.get('replica_depth', 0) <= 0 or self.info.get('primary_depth', 0) > 0:
+            return False
+        if self._flushing or self.info.get('wrote') or not getattr(clause, 'is_select', False):
+            return False
+        if REPLICA_BIND not in self._db.engines:
+            return False
+        if has_request_context() and http_session.get(_STICKY_KEY, 0) > time.time():
+            return False
+        return True
+
+
+def _db_session():
+    from app import db
+    return db.session()
+
+
+@contextmanager
+def _depth(key):
+    session = _db_session()
+    session.info[key] = session.info.get(key, 0) + 1
+    try:
+        yield
+    finally:
+        session.info[key] -= 1
+
+
+def read_replica():
+    """Route the enclosed reads to the replica (context manager or decorator)."""
+    return _depth('replica_depth')
+
+
+def primary():
+    """Force the enclosed reads onto the primary, even inside read_replica()."""
+    return _depth('primary_depth')
+
+
+def read_only(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with read_replica():
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def route_blueprint_to_replica(blueprint):
+    """Serve every GET request of the blueprint from the replica.
+
+    The request holds one read_replica() level from before_request until teardown, so
+    nothing that reuses the session afterwards (another request on the same app context,
+    a CLI command, a test) inherits the routing.
+    """
+
+    @blueprint.before_request
+    def _enter_replica():
+        if request.method == 'GET':
+            scope = read_replica()
+            scope.__enter__()
+            g._replica_scope = scope
+
+    @blueprint.teardown_request
+    def _leave_replica(exc):
+        scope = g.pop('_replica_scope', None)
+        if scope is not None:
+            scope.__exit__(None, None, None)
+
+
+def _mark_written(session, flush_context):
+    session.info['wrote'] = True
+
+
+def _mark_bulk_written(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        orm_execute_state.session.info['wrote'] = True
+
+
+def _stick_to_primary(session):
+    if session.info.get('wrote') and has_request_context():
+        http_session[_STICKY_KEY] = time.time() + STICKY_SECONDS
+
+
+def init_routing(db):
+    event.listen(db.session, 'after_flush', _mark_written)
+    event.listen(db.session, 'do_orm_execute', _mark_bulk_written)
+    event.listen(db.session, 'after_commit', _stick_to_primary)
@@ -0,0 +1,65 @@
+from flask import redirect, url_for, request, session, make_response, current_app
+from flask_login import current_user
+from functools import wraps
+from datetime import date
+from app.db_routing import primary
+import hashlib
+
+
+def role_required(*roles, unauthorized=None):
+    """Only let users whose role is in roles through; others get unauthorized() or the login page."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not current_user.is_authenticated or current_user.role not in roles:
+                if unauthorized is not None:
+                    return unauthorized()
+                return redirect(url_for('main.login'))
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def conditional_get(*tables):
+    """Answer GETs with 304 Not Modified while none of the tables the page reads has changed.
+
+    The ETag is built from the tables' version counters plus everything else the page
+    depends on (endpoint, query string, user, today's date, the asset build), so a 304
+    costs one small query and skips the view's queries and the template entirely.
+    Pages that issue an ETag are rendered from the primary, even on replica-routed blueprints.
+    """
+    tables = tuple(sorted(tables))
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are shown (and consumed) by the render, so always render
+            if request.method != 'GET' or session.get('_flashes'):
+                return fn(*args, **kwargs)
+
+            from app.dao import query_cache
+            versions = query_cache.current_versions(tables)
+            key = repr((request.endpoint, sorted(request.args.items(multi=True)), kwargs,
+                        current_user.get_id(), date.today().isoformat(), versions,
+                        current_app.extensions['assets'].version))
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                # The versions above come from the primary; a lagging replica would pin an
+                # older page under this ETag until the next write, so render from the primary too
+                with primary():
+                    response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,261 @@
+import json
+import logging
+import queue
+import threading
+import time
+from flask import Response, g, has_request_context
+from sqlalchemy import event
+
+
+logger = logging.getLogger('app.events')
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 256
+RETRY_MS = 5000
+# A stream ends after this long and the browser reconnects, so no connection pins a thread for good
+STREAM_MAX_SECONDS = 300
+
+
+class StreamLimitReached(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, hub, topics):
+        self.hub = hub
+        self.topics = set(topics)
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.lagged = False
+
+    def put(self, topic, data):
+        try:
+            self.queue.put_nowait((topic, data))
+        except queue.Full:
+            # A client this far behind gets disconnected and resyncs from a fresh snapshot
+            self.lagged = True
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """In-process publish/subscribe; each subscriber gets its own bounded queue.
+
+    publish() only reaches subscribers in this process. Changes committed by other
+    worker processes arrive through the TableWatcher below.
+    """
+
+    def __init__(self, max_subscribers=None):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.max_subscribers = max_subscribers
+        self.on_subscribe = None
+
+    def subscribe(self, topics):
+        subscription = Subscription(self, topics)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                raise StreamLimitReached()
+            self._subscribers.add(subscription)
+        if self.on_subscribe is not None:
+            self.on_subscribe()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def has_subscribers(self, topic):
+        with self._lock:
+            return any(topic in s.topics for s in self._subscribers)
+
+    def publish(self, topic, data, event=None):
+        """Send data to the topic's subscribers as an SSE event named event (the topic by default)."""
+        with self._lock:
+            targets = [s for s in self._subscribers if topic in s.topics]
+        for subscription in targets:
+            subscription.put(event or topic, data)
+        return len(targets)
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers)}
+
+
+hub = EventHub()
+
+
+def publish(topic, data, event=None):
+    return hub.publish(topic, data, event)
+
+
+class TableWatcher:
+    """Re-publishes a topic's current state whenever a table it depends on changes, in any worker.
+
+    One thread per process reads the table_versions counters every interval, but only
+    while someone in this process is subscribed to a watched topic. A change made by
+    another worker therefore reaches this worker's streams within one interval.
+    """
+
+    def __init__(self, hub, interval=3):
+        self.hub = hub
+        self.interval = interval
+        self.app = None
+        self._watches = []
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, topic, tables, snapshot, event=None):
+        """When any of tables changes, publish snapshot() to topic (as SSE event `event`)."""
+        self._watches.append((topic, tuple(tables), snapshot, event))
+
+    def ensure_running(self):
+        with self._lock:
+            if self._thread is None and self.app is not None and self._watches:
+                self._thread = threading.Thread(target=self._run, name='event-table-watcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                with self.app.app_context():
+                    self.poll()
+            except Exception:
+                logger.exception('table watcher poll failed')
+
+    def poll(self):
+        from app import db
+        from app.dao import version_dao
+
+        active = [w for w in self._watches if self.hub.has_subscribers(w[0])]
+        if not active:
+            # New subscribers get a fresh snapshot anyway; start from a new baseline
+            self._versions = {}
+            return
+
+        try:
+            tables = sorted({table for _, watched, _, _ in active for table in watched})
+            versions = version_dao.get_versions(tables)
+            previous, self._versions = self._versions, dict(self._versions, **versions)
+            for topic, watched, snapshot, event in active:
+                if any(table in previous and previous[table] != versions[table] for table in watched):
+                    self.hub.publish(topic, snapshot(), event)
+        finally:
+            db.session.remove()
+
+
+watcher = TableWatcher(hub)
+hub.on_subscribe = watcher.ensure_running
+
+
+def watch_tables(topic, tables, snapshot, event=None):
+    watcher.watch(topic, tables, snapshot, event)
+
+
+# --- publishing tied to the request / transaction lifecycle ---------------------
+
+def publish_on_commit(topic, data):
+    """Publish once the current transaction commits; dropped if it rolls back."""
+    from app import db
+    db.session().info.setdefault('pending_events', []).append((topic, data))
+
+
+def run_after_request(key, fn):
+    """Call fn() once at the end of the current request, e.g. to publish a value that needs a query.
+
+    Outside a request there are no subscribers in this process, so nothing is scheduled.
+    """
+    if has_request_context():
+        g.setdefault('_deferred_events', {})[key] = fn
+
+
+def _publish_pending(session):
+    for topic, data in session.info.pop('pending_events', []):
+        hub.publish(topic, data)
+
+
+def _drop_pending(session, previous_transaction):
+    if not previous_transaction.nested and not session.in_transaction():
+        session.info.pop('pending_events', None)
+
+
+def _run_deferred(response):
+    for fn in g.pop('_deferred_events', {}).values():
+        try:
+            fn()
+        except Exception:
+            logger.exception('deferred event publisher failed')
+    return response
+
+
+def init_events(app, db):
+    event.listen(db.session, 'after_commit', _publish_pending)
+    event.listen(db.session, 'after_soft_rollback', _drop_pending)
+    app.after_request(_run_deferred)
+    hub.max_subscribers = app.config.get('SSE_MAX_STREAMS')
+    watcher.interval = app.config.get('EVENTS_POLL_SECONDS', watcher.interval)
+    watcher.app = app
+
+
+# --- Server-Sent Events -------------------------------------------------------
+
+def format_sse(topic, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {topic}")
+    lines.extend(f"data: {line}" for line in json.dumps(data, default=str).splitlines())
+    return '\n'.join(lines) + '\n\n'
+
+
+def sse_stream(subscription, initial=()):
+    """Generator for a text/event-stream body: the initial events, then live ones plus heartbeats.
+
+    It never touches the database, so an idle connection costs a thread and nothing else,
+    and only for STREAM_MAX_SECONDS; the browser then reconnects and gets a fresh snapshot.
+    """
+    deadline = time.monotonic() + STREAM_MAX_SECONDS
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        for topic, data in initial:
+            yield format_sse(topic, data)
+        while not subscription.lagged and time.monotonic() < deadline:
+            item = subscription.get(min(HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0.1)))
+            if item is None:
+                yield ': ping\n\n'
+                continue
+            yield format_sse(*item)
+    finally:
+        subscription.close()
+
+
+def sse_response(subscription, initial=()):
+    response = Response(sse_stream(subscription, initial), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def stream_response(topics, initial):
+    """Subscribe to topics, then send initial() (a list of (event, data)) followed by live events.
+
+    Subscribing first means a change committed while initial() runs is not lost. When
+    this worker already serves SSE_MAX_STREAMS streams the client gets a 503 instead.
+    """
+    try:
+        subscription = hub.subscribe(topics)
+    except StreamLimitReached:
+        return Response('Too many live connections', status=503, headers={'Retry-After': '30'})
+    try:
+        return sse_response(subscription, initial())
+    except Exception:
+        subscription.close()
+        raise
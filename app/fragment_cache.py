@@ -0,0 +1,119 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+logger = logging.getLogger('app.fragment_cache')
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0}
+
+
+def _lookup(key):
+    with _lock:
+        value = _entries.get(key)
+        if value is None:
+            _stats['misses'] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats['hits'] += 1
+        return value
+
+
+def _store(key, value):
+    # Fragments are str, so their length is a close enough measure of their size
+    size = len(value)
+    max_bytes = current_app.config.get('FRAGMENT_CACHE_MAX_BYTES', 8 * 1024 * 1024)
+    max_entries = current_app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000)
+    if size > max_bytes:
+        return
+
+    with _lock:
+        old = _entries.pop(key, None)
+        if old is not None:
+            _stats['bytes'] -= len(old)
+        _entries[key] = value
+        _stats['bytes'] += size
+
+        while len(_entries) > max_entries or _stats['bytes'] > max_bytes:
+            _, evicted = _entries.popitem(last=False)
+            _stats['bytes'] -= len(evicted)
+            _stats['evictions'] += 1
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache 'name', entity.id, version... %}...{% endcache %} keeps the rendered block in memory.
+
+    Everything after the name is the key: the entity's id plus whatever identifies the
+    version being shown (the displayed fields, or anything else the block reads). When
+    any part changes the block is rendered under a new key and the old one ages out of
+    the LRU, so nothing has to be invalidated explicitly.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(args)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        if not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+            return caller()
+
+        # Fragments embed asset URLs, so a new asset build starts a new generation
+        key = (tuple(parts), current_app.extensions['assets'].version)
+        try:
+            hash(key)
+        except TypeError:
+            return caller()
+
+        value = _lookup(key)
+        if value is None:
+            value = str(caller())
+            _store(key, value)
+        return Markup(value)
+
+
+def _private_directory(path):
+    """Create path readable by this user only; None when it exists but others could write to it."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if hasattr(os, 'getuid') and (info.st_uid != os.getuid() or info.st_mode & 0o022):
+        return None
+    return path
+
+
+def init_fragment_cache(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    # Compiled templates survive restarts and are shared by every worker process. Bytecode is
+    # loaded and run as code, so it only lives in a directory no other user can write to.
+    path = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if app.config.get('JINJA_BYTECODE_CACHE', True) and path:
+        if _private_directory(path):
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(path)
+        else:
+            logger.warning('Jinja bytecode cache disabled: %s is writable by other users', path)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _stats['bytes'] = 0
+
+
+def stats():
+    with _lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return dict(_stats,
+                    entries=len(_entries),
+                    hit_ratio=round(_stats['hits'] / lookups, 3) if lookups else 0.0)
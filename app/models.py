@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, Float, Enum, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, Float, Enum, DateTime, Date, Index
 from sqlalchemy.orm import relationship
 from app import db, app
 from flask_login import UserMixin
@@ -39,6 +39,7 @@ class Car(db.Model):
     
     id = Column(Integer, primary_key=True)
     license_plate = Column(String(20), unique=True, nullable=False)
+    plate_normalized = Column(String(20), index=True)
     owner_name = Column(String(100), nullable=False)
     phone_number = Column(String(20))
     address = Column(String(255))
@@ -54,6 +55,9 @@ class Car(db.Model):
 
 class ReceptionSlip(db.Model):
     __tablename__ = 'reception_slips'
+    __table_args__ = (
+        Index('ix_reception_slips_date_id', 'reception_date', 'id'),
+    )
     
     id = Column(Integer, primary_key=True)
     car_id = Column(Integer, ForeignKey('cars.id'), nullable=False)
@@ -82,12 +86,18 @@ class Component(db.Model):
 
 class RepairSlip(db.Model):
     __tablename__ = 'repair_slips'
+    __table_args__ = (
+        Index('ix_repair_slips_end_date_id', 'end_date', 'id'),
+    )
     
     id = Column(Integer, primary_key=True)
     reception_slip_id = Column(Integer, ForeignKey('reception_slips.id'), nullable=False)
     technician_id = Column(Integer, ForeignKey('users.id'))
     start_date = Column(DateTime, default=datetime.now)
     end_date = Column(DateTime)
+    subtotal = Column(Float, default=0)
+    item_count = Column(Integer, default=0)
+    labor_total = Column(Float, default=0)
     
     technician = relationship('User', backref='repairs', lazy=True)
     details = relationship('RepairDetail', backref='repair_slip', lazy=True)
@@ -121,7 +131,7 @@ class Invoice(db.Model):
     cashier_id = Column(Integer, ForeignKey('users.id'))
     total_amount = Column(Float, nullable=False)
     vat_rate = Column(Float, default=10.0)
-    created_at = Column(DateTime, default=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, index=True)
     payment_method = Column(String(50), default='cash')
     
     repair_slip = relationship('RepairSlip', backref='invoice', lazy=True)
@@ -131,6 +141,28 @@ class Invoice(db.Model):
         return f"Invoice #{self.id}"
 
 
+class DailyRevenue(db.Model):
+    __tablename__ = 'daily_revenue'
+
+    revenue_date = Column(Date, primary_key=True)
+    payment_method = Column(String(50), primary_key=True)
+    total_amount = Column(Float, nullable=False, default=0)
+    invoice_count = Column(Integer, nullable=False, default=0)
+
+    def __str__(self):
+        return f"{self.revenue_date} {self.payment_method}: {self.total_amount}"
+
+
+class DailyCapacity(db.Model):
+    __tablename__ = 'daily_capacity'
+
+    capacity_date = Column(Date, primary_key=True)
+    slip_count = Column(Integer, nullable=False, default=0)
+
+    def __str__(self):
+        return f"{self.capacity_date}: {self.slip_count} slips"
+
+
 class SystemSetting(db.Model):
     __tablename__ = 'system_settings'
     
@@ -141,6 +173,16 @@ class SystemSetting(db.Model):
         return f"{self.setting_key}: {self.setting_value}"
 
 
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    table_name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    def __str__(self):
+        return f"{self.table_name}: v{self.version}"
+
+
 # Initialize database with seed data
 # if __name__ == '__main__':
 #     with app.app_context():
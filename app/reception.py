@@ -1,22 +1,22 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from app.decorators import role_required, conditional_get
+from app.dao.unit_of_work import unit_of_work
 from app.dao import reception_dao, car_dao, settings_dao
 from datetime import datetime
 
 reception_bp = Blueprint('reception', __name__)
 
 
-def check_reception():
-    role = session.get('role')
-    return role in ['reception', 'admin']
+reception_required = role_required('reception', 'admin')
 
 
-def get_reception_data(keyword=None):
+def get_reception_data(keyword=None, cursor=None):
     max_cars = settings_dao.get_setting_int('max_cars_per_day', 30)
     cars_today_count = reception_dao.count_today_slips()
-    slips_data = reception_dao.get_all_slips(keyword=keyword)
+    page = reception_dao.get_slips_page(keyword=keyword, cursor=cursor)
 
     slips = []
-    for slip, car in slips_data:
+    for slip, car in page['items']:
         slips.append({
             'id': slip.id,
             'car_id': slip.car_id,
@@ -32,32 +32,31 @@ def get_reception_data(keyword=None):
             'color': car.color
         })
     
-    return max_cars, cars_today_count, slips
+    pagination = {
+        'next_cursor': page['next_cursor'],
+        'approx_total': page['approx_total'],
+        'is_first': not cursor
+    }
+
+    return max_cars, cars_today_count, slips, pagination
 
 
 @reception_bp.route('/')
+@reception_required
+@conditional_get('reception_slips', 'cars', 'daily_capacity', 'system_settings')
 def home():
-    if not check_reception():
-        return redirect(url_for('main.login'))
-    
     keyword = request.args.get('q')
-    max_cars, cars_today_count, slips = get_reception_data(keyword)
+    cursor = request.args.get('cursor')
+    max_cars, cars_today_count, slips, pagination = get_reception_data(keyword, cursor)
     
-    return render_template('reception/home.html', slips=slips, cars_today_count=cars_today_count, max_cars=max_cars, keyword=keyword)
+    return render_template('reception/home.html', slips=slips, cars_today_count=cars_today_count, max_cars=max_cars, keyword=keyword, pagination=pagination)
 
 
 @reception_bp.route('/add', methods=['GET', 'POST'])
+@reception_required
 def add_car():
-    if not check_reception():
-        return redirect(url_for('main.login'))
-    
     if request.method == 'POST':
         max_cars = settings_dao.get_setting_int('max_cars_per_day', 30)
-        current_count = reception_dao.count_today_slips()
-        
-        if current_count >= max_cars:
-            flash(f'Daily limit of {max_cars} cars reached. Cannot receive more cars today.')
-            return redirect(url_for('reception.home'))
 
         license_plate = request.form['license_plate']
         owner_name = request.form['owner_name']
@@ -69,19 +68,27 @@ def add_car():
         color = request.form.get('color', '')
         status = request.form.get('status', 'pending')
 
-        car = car_dao.create_or_update_car(license_plate, owner_name, phone, address, email, vehicle_type, color)
-
         slip_id = request.args.get('slip_id')
+        try:
+            with unit_of_work():
+                car = car_dao.create_or_update_car(license_plate, owner_name, phone, address, email, vehicle_type, color)
+
+                if slip_id:
+                    reception_dao.update_slip(int(slip_id), car.id, description, status)
+                else:
+                    reception_dao.create_slip(car.id, description, status, max_cars=max_cars)
+        except reception_dao.DailyLimitReached:
+            flash(f'Daily limit of {max_cars} cars reached. Cannot receive more cars today.')
+            return redirect(url_for('reception.home'))
+
         if slip_id:
-            reception_dao.update_slip(int(slip_id), car.id, description, status)
             flash('Reception slip updated successfully!')
         else:
-            reception_dao.create_slip(car.id, description, status)
             flash('Car received successfully!')
             
         return redirect(url_for('reception.home'))
 
-    max_cars, cars_today_count, slips = get_reception_data()
+    max_cars, cars_today_count, slips, pagination = get_reception_data()
 
     slip_id = request.args.get('slip_id')
     slip = None
@@ -105,15 +112,13 @@ def add_car():
             }
     
     now_date = datetime.now().strftime('%Y-%m-%d')
-    return render_template('reception/home.html', slips=slips, cars_today_count=cars_today_count, max_cars=max_cars, modal='add', slip=slip, now_date=now_date)
+    return render_template('reception/home.html', slips=slips, cars_today_count=cars_today_count, max_cars=max_cars, modal='add', slip=slip, now_date=now_date, pagination=pagination)
 
 
 @reception_bp.route('/detail/<int:slip_id>')
+@reception_required
 def detail(slip_id):
-    if not check_reception():
-        return redirect(url_for('main.login'))
-    
-    max_cars, cars_today_count, slips = get_reception_data()
+    max_cars, cars_today_count, slips, pagination = get_reception_data()
     
     result = reception_dao.get_slip_by_id(slip_id)
     if not result:
@@ -136,4 +141,4 @@ def detail(slip_id):
         'color': car.color
     }
         
-    return render_template('reception/home.html', slips=slips, cars_today_count=cars_today_count, max_cars=max_cars, modal='detail', slip=slip)
+    return render_template('reception/home.html', slips=slips, cars_today_count=cars_today_count, max_cars=max_cars, modal='detail', slip=slip, pagination=pagination)
@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from logging.handlers import RotatingFileHandler
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger('app.sql')
+slow_logger = logging.getLogger('app.sql.slow')
+slow_logger.propagate = False
+
+TOP_STATEMENTS = 3
+
+_string_literal = re.compile(r"'(?:[^']|'')*'")
+_number_literal = re.compile(r"\b\d+(?:\.\d+)?\b")
+_in_list = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_whitespace = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def normalize_sql(statement):
+    """SQL with literals and placeholders folded to ?, so the same query always looks the same."""
+    sql = _string_literal.sub('?', statement)
+    sql = re.sub(r"%\(\w+\)s|%s|:\w+", '?', sql)
+    sql = _number_literal.sub('?', sql)
+    sql = _in_list.sub('(?...)', sql)
+    return _whitespace.sub(' ', sql).strip()
+
+
+def fingerprint_params(parameters):
+    # A hash rather than the values: slow logs must not carry customer names or phone numbers
+    return hashlib.sha1(repr(parameters).encode('utf-8', 'replace')).hexdigest()[:12]
+
+
+def _request_stats():
+    if not has_request_context():
+        return None
+    return g.get('_sql_stats')
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats()
+    if stats is not None and stats['enforce'] and not stats['committed'] and stats['count'] >= stats['budget']:
+        # Stop before the statement runs: nothing this request wrote has been committed yet,
+        # so failing here rolls it back instead of reporting an error for saved work
+        raise QueryBudgetExceeded(_budget_message(stats['count'] + 1, stats['budget']))
+    if context is not None:
+        context._profiler_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'commit')
+def _on_commit(conn):
+    stats = _request_stats()
+    if stats is not None:
+        stats['committed'] = True
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_profiler_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+
+    stats = _request_stats()
+    if stats is not None:
+        stats['count'] += 1
+        stats['time'] += elapsed
+        stats['slowest'].append((elapsed, statement))
+        stats['slowest'].sort(key=lambda s: s[0], reverse=True)
+        del stats['slowest'][TOP_STATEMENTS:]
+
+    threshold = _config('SLOW_QUERY_MS', 200)
+    if threshold is not None and elapsed * 1000 >= threshold:
+        route = request.endpoint if has_request_context() else '-'
+        slow_logger.warning('%.1fms route=%s params=%s sql=%s',
+                            elapsed * 1000, route or request.path,
+                            fingerprint_params(parameters), normalize_sql(statement))
+
+
+def _config(key, default=None):
+    from app import app
+    return app.config.get(key, default)
+
+
+def _start_request():
+    budget = _query_budget(request.endpoint)
+    g._sql_stats = {
+        'count': 0, 'time': 0.0, 'slowest': [], 'started': time.perf_counter(),
+        'budget': budget, 'committed': False,
+        'enforce': budget is not None and _config('SQL_QUERY_BUDGET_MODE', 'log') == 'raise'
+    }
+
+
+def _server_timing(stats, detail):
+    total = (time.perf_counter() - stats['started']) * 1000
+    db_ms = stats['time'] * 1000
+    metrics = [
+        f'db;dur={db_ms:.1f};desc="{stats["count"]} queries"',
+        f'app;dur={max(total - db_ms, 0):.1f}'
+    ]
+    if detail:
+        for i, (elapsed, statement) in enumerate(stats['slowest'], 1):
+            desc = normalize_sql(statement)[:80].replace('"', "'").replace('\\', '')
+            metrics.append(f'sql-{i};dur={elapsed * 1000:.1f};desc="{desc}"')
+    return ', '.join(metrics)
+
+
+def _query_budget(endpoint):
+    budgets = _config('SQL_QUERY_BUDGETS') or {}
+    return budgets.get(endpoint, _config('SQL_QUERY_BUDGET_DEFAULT'))
+
+
+def _budget_message(count, budget):
+    return f"{request.endpoint} ran {count} queries (budget {budget})"
+
+
+def _finish_request(response):
+    stats = g.pop('_sql_stats', None)
+    if stats is None:
+        return response
+
+    response.headers['Server-Timing'] = _server_timing(stats, _config('SERVER_TIMING_DETAIL', False))
+
+    # The response is already built (and may have committed), so an overrun found here is only
+    # reported; 'raise' mode stops a request at the statement that crosses the budget instead
+    budget = stats['budget']
+    if budget is not None and stats['count'] > budget:
+        logger.warning(_budget_message(stats['count'], budget))
+        response.headers['X-Query-Budget-Exceeded'] = f"{stats['count']}/{budget}"
+    return response
+
+
+def init_profiler(app):
+    """Per-request query count/time in a Server-Timing header, slow-query log and query budgets."""
+    path = app.config.get('SLOW_QUERY_LOG')
+    if path and not slow_logger.handlers:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024),
+                                      backupCount=app.config.get('SLOW_QUERY_LOG_BACKUPS', 5), encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_logger.addHandler(handler)
+        slow_logger.setLevel(logging.WARNING)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
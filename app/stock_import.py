@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+import logging
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.dao import component_dao
+
+
+logger = logging.getLogger('app.stock_import')
+
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+
+def _parse_csv(lines):
+    reader = csv.reader(lines)
+    header = None
+    for row in reader:
+        # The physical line the record ends on, which stays right when a quoted field spans lines
+        line_no = reader.line_num
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if header is None and not row[0].strip().lstrip('-').isdigit():
+            header = [cell.strip().lower() for cell in row]
+            continue
+        if header:
+            record = dict(zip(header, row))
+            yield line_no, record.get('component_id', record.get('id')), record.get('quantity')
+        else:
+            yield line_no, row[0], row[1] if len(row) > 1 else None
+
+
+def _parse_jsonl(lines):
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, None, None
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, None
+            continue
+        yield line_no, record.get('component_id', record.get('id')), record.get('quantity')
+
+
+def import_manifest(stream, fmt='csv', batch_size=BATCH_SIZE):
+    """Apply a delivery manifest read line by line from a binary stream.
+
+    Rows are applied in batches, each in its own transaction, so memory use does not
+    depend on the manifest size. Invalid rows and unknown components are reported
+    per line and skipped.
+    """
+    lines = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    rows = _parse_jsonl(lines) if fmt == 'jsonl' else _parse_csv(lines)
+
+    result = {'rows': 0, 'applied': 0, 'batches': 0, 'error_count': 0, 'errors': []}
+
+    def report(line_no, message):
+        result['error_count'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append({'line': line_no, 'error': message})
+
+    batch, batch_lines = {}, {}
+    pending_rows = 0
+
+    def flush():
+        nonlocal pending_rows
+        if not batch:
+            return
+        try:
+            missing = component_dao.import_stock(batch)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.exception('stock import batch %d failed', result['batches'] + 1)
+            message = str(getattr(e, 'orig', None) or e).splitlines()[0]
+            for component_id, line_nos in batch_lines.items():
+                for line_no in line_nos:
+                    report(line_no, f'batch failed, not applied: {message}')
+        else:
+            missing = set(missing)
+            for component_id, line_nos in batch_lines.items():
+                if component_id in missing:
+                    for line_no in line_nos:
+                        report(line_no, f'component {component_id} not found')
+                else:
+                    result['applied'] += len(line_nos)
+        result['batches'] += 1
+        batch.clear()
+        batch_lines.clear()
+        pending_rows = 0
+
+    for line_no, component_id, quantity in rows:
+        result['rows'] += 1
+        try:
+            component_id = int(str(component_id).strip())
+            quantity = int(str(quantity).strip())
+        except (TypeError, ValueError):
+            report(line_no, 'component_id and quantity must be integers')
+            continue
+        if quantity <= 0:
+            report(line_no, 'quantity must be positive')
+            continue
+
+        batch[component_id] = batch.get(component_id, 0) + quantity
+        batch_lines.setdefault(component_id, []).append(line_no)
+        pending_rows += 1
+        if pending_rows >= batch_size:
+            flush()
+
+    flush()
+    return result
@@ -1,14 +1,14 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from app.dao import repair_dao, reception_dao, component_dao
+from app.decorators import role_required, conditional_get
+from app.dao.unit_of_work import unit_of_work
+from app.dao import repair_dao, reception_dao, component_dao, search_dao
 from app.models import ReceptionSlip, Car, RepairSlip
-from app import db
+from app import db, events
 
 technician_bp = Blueprint('technician', __name__)
 
 
-def check_technician():
-    role = session.get('role')
-    return role in ['technician', 'admin']
+technician_required = role_required('technician', 'admin')
 
 
 def get_technician_data(filter_status=None, keyword=None):
@@ -21,11 +21,7 @@ def get_technician_data(filter_status=None, keyword=None):
             .filter(ReceptionSlip.status.in_(['pending', 'waiting']))
             
         if keyword:
-            search_term = f"%{keyword}%"
-            query = query.filter(
-                (Car.license_plate.ilike(search_term)) |
-                (Car.owner_name.ilike(search_term))
-            )
+            query = query.filter(search_dao.car_search_condition(keyword))
             
         results = query.order_by(ReceptionSlip.reception_date.asc()).all()
         
@@ -67,36 +63,50 @@ def get_technician_data(filter_status=None, keyword=None):
 
 
 @technician_bp.route('/')
+@technician_required
+@conditional_get('reception_slips', 'repair_slips', 'cars')
 def home():
-    if not check_technician():
-        return redirect(url_for('main.login'))
-    
     filter_status = request.args.get('filter')
     keyword = request.args.get('q')
     slips = get_technician_data(filter_status, keyword)
     
-    print(slips)
     return render_template('technician/home.html', slips=slips, current_filter=filter_status, keyword=keyword)
 
 
-@technician_bp.route('/start/<int:slip_id>', methods=['POST'])
-def start_repair(slip_id):
-    if not check_technician():
-        return redirect(url_for('main.login'))
+@technician_bp.route('/queue')
+@technician_required
+def queue_board():
+    """Live work-queue board; rows arrive over the stream below, so rendering it runs no queries."""
+    return render_template('technician/queue.html')
+
 
-    repair = repair_dao.create_repair_slip(slip_id, session['user_id'])
+@technician_bp.route('/queue/stream')
+@technician_required
+def queue_stream():
+    """SSE: one 'snapshot' of open slips, then the slip-level changes made by this worker.
 
-    reception_dao.update_slip_status(slip_id, 'repairing')
+    Changes committed by other workers arrive as a fresh 'snapshot'.
+    """
+    return events.stream_response(
+        [reception_dao.QUEUE_TOPIC],
+        lambda: [('snapshot', reception_dao.get_queue_snapshot())]
+    )
+
+
+@technician_bp.route('/start/<int:slip_id>', methods=['POST'])
+@technician_required
+def start_repair(slip_id):
+    with unit_of_work():
+        repair = repair_dao.create_repair_slip(slip_id, session['user_id'])
+        reception_dao.update_slip_status(slip_id, 'repairing')
     
     flash('Repair started. Please add items.')
     return redirect(url_for('technician.add_item_view', repair_id=repair.id))
 
 
 @technician_bp.route('/detail/<int:slip_id>')
+@technician_required
 def view_detail(slip_id):
-    if not check_technician():
-        return redirect(url_for('main.login'))
-    
     filter_status = request.args.get('filter')
     slips = get_technician_data(filter_status)
 
@@ -139,15 +149,12 @@ def view_detail(slip_id):
             })
     
     components = component_dao.get_all_active()
-    print(repair)
     return render_template('technician/home.html', slips=slips, current_filter=filter_status, modal='detail', repair=repair, items=items, components=components)
 
 
 @technician_bp.route('/repair/<int:repair_id>/add', methods=['GET'])
+@technician_required
 def add_item_view(repair_id):
-    if not check_technician():
-        return redirect(url_for('main.login'))
-    
     slips = get_technician_data()
     result = repair_dao.get_repair_by_id(repair_id)
     if not result:
@@ -190,10 +197,8 @@ def add_item_view(repair_id):
 
 
 @technician_bp.route('/repair/<int:repair_id>/edit/<int:item_id>', methods=['GET'])
+@technician_required
 def edit_item_view(repair_id, item_id):
-    if not check_technician():
-        return redirect(url_for('main.login'))
-    
     slips = get_technician_data()
     
     result = repair_dao.get_repair_by_id(repair_id)
@@ -241,10 +246,8 @@ def edit_item_view(repair_id, item_id):
 
 
 @technician_bp.route('/repair/<int:repair_id>/add_item', methods=['POST'])
+@technician_required
 def add_item(repair_id):
-    if not check_technician():
-        return redirect(url_for('main.login'))
-    
     component_id = request.form.get('component_id')
     quantity = int(request.form.get('quantity', 1))
     category = request.form.get('category', '')
@@ -272,10 +275,8 @@ def add_item(repair_id):
 
 
 @technician_bp.route('/item/update/<int:item_id>', methods=['POST'])
+@technician_required
 def update_item(item_id):
-    if not check_technician():
-        return redirect(url_for('main.login'))
-    
     component_id = request.form.get('component_id')
     quantity = int(request.form.get('quantity', 1))
     category = request.form.get('category', '')
@@ -306,13 +307,10 @@ def update_item(item_id):
 
 
 @technician_bp.route('/item/delete/<int:item_id>', methods=['POST'])
+@technician_required
 def delete_item(item_id):
-    if not check_technician():
-        return redirect(url_for('main.login'))
-    
     repair_id = repair_dao.delete_repair_detail(item_id)
     
-    print(repair_id)
     if repair_id:
         flash('Item deleted.')
         return redirect(url_for('technician.view_detail', slip_id=repair_id))
@@ -321,14 +319,13 @@ def delete_item(item_id):
 
 
 @technician_bp.route('/repair/<int:repair_id>/finish', methods=['POST'])
+@technician_required
 def finish_repair(repair_id):
-    if not check_technician():
-        return redirect(url_for('main.login'))
-    
     repair = repair_dao.get_repair_only_by_id(repair_id)
     if repair:
-        reception_dao.update_slip_status(repair.reception_slip_id, 'completed')
-        repair_dao.finish_repair(repair_id)
+        with unit_of_work():
+            reception_dao.update_slip_status(repair.reception_slip_id, 'completed')
+            repair_dao.finish_repair(repair_id)
     
     flash('Repair finished. Sent to Cashier.')
     return redirect(url_for('technician.home'))
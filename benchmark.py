@@ -0,0 +1,206 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from sqlalchemy import event, func
+from app import app, db
+from app.models import User, Car, ReceptionSlip, RepairSlip, RepairDetail, Invoice, Component
+from app.dao import (reception_dao, repair_dao, invoice_dao, component_dao, forecast_dao,
+                     search_dao)
+from app.dao.component_dao import ComponentDAO
+
+# Logins created by init_db.py
+VIEW_USERS = {'admin': 'admin', 'reception': 'reception', 'technician': 'tech', 'cashier': 'cashier'}
+
+
+def dao_cases(ctx):
+    today = datetime.now()
+    return [
+        ('reception_dao.get_all_slips', lambda: reception_dao.get_all_slips()),
+        ('reception_dao.get_slips_page', lambda: reception_dao.get_slips_page()),
+        ('reception_dao.get_slips_page[keyword]', lambda: reception_dao.get_slips_page(keyword=ctx['keyword'])),
+        ('reception_dao.count_today_slips', lambda: reception_dao.count_today_slips()),
+        ('repair_dao.get_repairs_by_technician', lambda: repair_dao.get_repairs_by_technician(ctx['technician_id'])),
+        ('repair_dao.get_finished_repairs_page', lambda: repair_dao.get_finished_repairs_page()),
+        ('invoice_dao.get_revenue_by_month', lambda: invoice_dao.get_revenue_by_month(today.month, today.year)),
+        ('invoice_dao.get_total_revenue_by_month', lambda: invoice_dao.get_total_revenue_by_month(today.month, today.year)),
+        ('invoice_dao.get_recent_invoices', lambda: invoice_dao.get_recent_invoices()),
+        ('component_dao.get_usage_stats', lambda: component_dao.get_usage_stats()),
+        ('component_dao.get_top_components', lambda: component_dao.get_top_components()),
+        ('ComponentDAO.get_low_stock_components', lambda: ComponentDAO.get_low_stock_components()),
+        ('forecast_dao.get_all_active_forecast', lambda: forecast_dao.get_all_active_forecast()),
+        ('search_dao.search_cars', lambda: search_dao.search_cars(ctx['keyword'])),
+    ]
+
+
+VIEW_CASES = [
+    ('reception', '/reception/'),
+    ('reception', '/reception/?q={keyword}'),
+    ('technician', '/technician/'),
+    ('cashier', '/cashier/'),
+    ('admin', '/admin/dashboard'),
+    ('admin', '/admin/accessories'),
+    ('admin', '/admin/low-stock-alert'),
+]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+def summarize(name, kind, timings, queries):
+    timings_ms = sorted(t * 1000 for t in timings)
+    return {
+        'name': name,
+        'kind': kind,
+        'runs': len(timings_ms),
+        'min_ms': round(timings_ms[0], 3),
+        'median_ms': round(statistics.median(timings_ms), 3),
+        'p95_ms': round(timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.95))], 3),
+        'mean_ms': round(statistics.fmean(timings_ms), 3),
+        'queries': queries
+    }
+
+
+def run_case(fn, repeat, warmup, counter):
+    timings = []
+    for i in range(warmup + repeat):
+        counter.count = 0
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed)
+    return timings, counter.count
+
+
+def benchmark_daos(ctx, repeat, warmup, counter, selected):
+    results = []
+    for name, fn in dao_cases(ctx):
+        if selected and not any(s in name for s in selected):
+            continue
+
+        def call():
+            # A fresh app context (so a fresh g and session) per call, like a real request
+            with app.test_request_context():
+                fn()
+
+        timings, queries = run_case(call, repeat, warmup, counter)
+        results.append(summarize(name, 'dao', timings, queries))
+        print(f" {name:45} median {results[-1]['median_ms']:>10.2f} ms  q={queries}")
+    return results
+
+
+def benchmark_views(ctx, repeat, warmup, counter, selected):
+    results = []
+    clients = {}
+    for role, url in VIEW_CASES:
+        url = url.format(**ctx)
+        name = f"GET {url}"
+        if selected and not any(s in name for s in selected):
+            continue
+
+        client = clients.get(role)
+        if client is None:
+            client = clients[role] = app.test_client()
+            response = client.post('/login', data={'username': VIEW_USERS[role], 'password': '123'})
+            if response.status_code != 302:
+                raise SystemExit(f"could not log in as {VIEW_USERS[role]}; run init_db.py first")
+
+        def call():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise SystemExit(f"{url} returned {response.status_code}")
+
+        timings, queries = run_case(call, repeat, warmup, counter)
+        results.append(summarize(name, 'view', timings, queries))
+        print(f" {name:45} median {results[-1]['median_ms']:>10.2f} ms  q={queries}")
+    return results
+
+
+def row_counts():
+    return {model.__tablename__: db.session.query(func.count()).select_from(model).scalar()
+            for model in (Car, ReceptionSlip, RepairSlip, RepairDetail, Invoice, Component)}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous_path, results):
+    with open(previous_path, encoding='utf-8') as f:
+        previous = {r['name']: r for r in json.load(f)['results']}
+
+    print(f"\n {'case':45} {'before':>10} {'after':>10} {'change':>8}")
+    for r in results:
+        before = previous.get(r['name'])
+        if not before:
+            continue
+        change = (r['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0
+        print(f" {r['name']:45} {before['median_ms']:>10.2f} {r['median_ms']:>10.2f} {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time DAO functions and views against the current database')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs per case')
+    parser.add_argument('--only', action='append', help='run cases whose name contains this text (repeatable)')
+    parser.add_argument('--skip-views', action='store_true', help='only time DAO functions')
+    parser.add_argument('--cache', action='store_true', help='leave the query cache on (off by default)')
+    parser.add_argument('--output', default=f"bench-{datetime.now():%Y%m%d-%H%M%S}.json", help='JSON results file')
+    parser.add_argument('--compare', help='earlier results file to print a comparison against')
+    args = parser.parse_args()
+
+    app.config['TESTING'] = True
+    app.config['QUERY_CACHE_ENABLED'] = args.cache
+    app.config['SQL_QUERY_BUDGET_MODE'] = 'log'
+
+    counter = QueryCounter()
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', counter)
+
+        technician = User.query.filter(User.role == 'technician').order_by(User.id).first()
+        car = Car.query.order_by(Car.id).first()
+        if technician is None or car is None:
+            raise SystemExit('no data to benchmark; run init_db.py and generate_data.py first')
+        ctx = {'technician_id': technician.id, 'keyword': car.owner_name.split()[0]}
+
+        meta = {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'database': db.engine.dialect.name,
+            'query_cache': args.cache,
+            'repeat': args.repeat,
+            'warmup': args.warmup,
+            'rows': row_counts()
+        }
+
+    # Measure outside the setup context: a request pushed inside it would reuse its g
+    # (version and settings memos) and its session, and report cached work as free
+    results = benchmark_daos(ctx, args.repeat, args.warmup, counter, args.only)
+    if not args.skip_views:
+        results += benchmark_views(ctx, args.repeat, args.warmup, counter, args.only)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+    print(f"\n Results written to {args.output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import urllib.request
+from app import app
+from app.assets import MANIFEST, VENDOR
+from app.compression import PRECOMPRESSED
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+STATIC = app.static_folder
+DIST = os.path.join(STATIC, os.path.dirname(MANIFEST))
+
+# Output name -> source files, concatenated in order then minified
+CSS_BUNDLES = {
+    'css/style.css': ['css/style.css'],
+}
+IMAGE_DIR = 'images'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Icons drawn at 20-30px that ship at 512-1024px; 96px still covers 3x screens
+IMAGE_MAX_WIDTH = {
+    'images/paid.png': 96,
+    'images/logout.png': 96,
+    'images/secure.png': 96,
+    'images/chart.png': 96,
+}
+# Text assets get .gz/.br siblings so the server never compresses them per request
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg')
+WEBP_QUALITY = 80
+AVIF_QUALITY = 50
+HASH_LENGTH = 10
+
+
+def fingerprint(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def write_hashed(name, data):
+    """Write data under dist/ with its content hash in the file name; returns the static-relative path."""
+    path = 'dist/' + fingerprint(name, data)
+    target = os.path.join(STATIC, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if not os.path.exists(target):
+        with open(target, 'wb') as f:
+            f.write(data)
+    return path
+
+
+def read_static(name):
+    with open(os.path.join(STATIC, name), 'rb') as f:
+        return f.read()
+
+
+def minify_css(text):
+    # Good enough for our own stylesheet: no strings containing ; { } or comment markers
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def rewrite_css_urls(text, source, files):
+    """Point relative url(...) references at the fingerprinted files, relative to dist/css."""
+    source_dir = os.path.dirname(source)
+    out_dir = os.path.dirname('dist/' + source)
+
+    def replace(match):
+        ref = match.group(2)
+        if re.match(r'^(?:[a-z]+:|/|#)', ref):
+            return match.group(0)
+        logical = os.path.normpath(os.path.join(source_dir, ref)).replace(os.sep, '/')
+        target = files.get(logical, logical)
+        return f'url("{os.path.relpath(target, out_dir).replace(os.sep, "/")}")'
+
+    return re.sub(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)', replace, text)
+
+
+def build_images(files, variants, report):
+    names = sorted(f"{IMAGE_DIR}/{n}" for n in os.listdir(os.path.join(STATIC, IMAGE_DIR))
+                   if n.lower().endswith(IMAGE_EXTENSIONS))
+    for name in names:
+        original = read_static(name)
+        if Image is None:
+            files[name] = write_hashed(name, original)
+            report.append((name, len(original), {'copy': len(original)}))
+            continue
+
+        image = Image.open(io.BytesIO(original))
+        image.load()
+        max_width = IMAGE_MAX_WIDTH.get(name)
+        if max_width and image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+            fallback = encode(image, 'PNG' if name.endswith('.png') else 'JPEG')
+        else:
+            # Only keep the re-encoded file when it actually beats the original
+            fallback = min(original, encode(image, 'PNG' if name.endswith('.png') else 'JPEG'), key=len)
+        files[name] = write_hashed(name, fallback)
+        sizes = {os.path.splitext(name)[1][1:]: len(fallback)}
+
+        formats = {}
+        for mime, ext, fmt, options in modern_formats():
+            data = encode(image, fmt, **options)
+            if len(data) < len(fallback):
+                formats[mime] = write_hashed(os.path.splitext(name)[0] + ext, data)
+                sizes[ext[1:]] = len(data)
+        if formats:
+            variants[name] = formats
+        report.append((name, len(original), sizes))
+
+
+def modern_formats():
+    # Best first: browsers take the first <source> / image-set() entry they support
+    formats = []
+    if features.check('avif'):
+        formats.append(('image/avif', '.avif', 'AVIF', {'quality': AVIF_QUALITY}))
+    if features.check('webp'):
+        formats.append(('image/webp', '.webp', 'WEBP', {'quality': WEBP_QUALITY, 'method': 6}))
+    return formats
+
+
+def encode(image, fmt, **options):
+    if fmt == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, optimize=fmt in ('PNG', 'JPEG'), **options)
+    return buffer.getvalue()
+
+
+def build_css(files, report):
+    for name, sources in CSS_BUNDLES.items():
+        text = '\n'.join(rewrite_css_urls(read_static(source).decode('utf-8'), source, files)
+                         for source in sources)
+        data = minify_css(text).encode('utf-8')
+        files[name] = write_hashed(name, data)
+        report.append((name, sum(len(read_static(s)) for s in sources), {'min.css': len(data)}))
+
+
+def build_vendor(files, report, fetch):
+    for name, url in VENDOR.items():
+        path = os.path.join(STATIC, name)
+        if not os.path.exists(path):
+            if not fetch:
+                print(f"  {name}: missing from static/, run with --fetch-vendor to download {url}")
+                continue
+            print(f"  downloading {url}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with urllib.request.urlopen(url, timeout=60) as response, open(path, 'wb') as f:
+                shutil.copyfileobj(response, f)
+        data = read_static(name)
+        files[name] = write_hashed(name, data)
+        report.append((name, len(data), {'js': len(data)}))
+
+
+def precompress(files):
+    encoders = {'gzip': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoders['br'] = lambda data: brotli.compress(data, quality=11)
+    count = 0
+    for path in files.values():
+        if not path.endswith(PRECOMPRESS_EXTENSIONS):
+            continue
+        data = read_static(path)
+        for encoding, encode_data in encoders.items():
+            target = os.path.join(STATIC, path + PRECOMPRESSED[encoding])
+            if os.path.exists(target):
+                continue
+            compressed = encode_data(data)
+            if len(compressed) < len(data):
+                with open(target, 'wb') as f:
+                    f.write(compressed)
+                count += 1
+    return count
+
+
+def write_manifest(files, variants):
+    os.makedirs(DIST, exist_ok=True)
+    target = os.path.join(STATIC, MANIFEST)
+    tmp = target + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'files': files, 'variants': variants}, f, indent=2, sort_keys=True)
+    # A running server may be reading the manifest; swap it in atomically
+    os.replace(tmp, target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build fingerprinted, compressed static assets into app/static/dist')
+    parser.add_argument('--clean', action='store_true', help='delete files from earlier builds first')
+    parser.add_argument('--fetch-vendor', action='store_true', help='download vendored libraries that are missing')
+    args = parser.parse_args()
+
+    if args.clean and os.path.isdir(DIST):
+        shutil.rmtree(DIST)
+    if Image is None:
+        print("Pillow is not installed: images are fingerprinted but not resized or converted")
+    if brotli is None:
+        print("brotli is not installed: only .gz files are precompressed")
+
+    files, variants, report = {}, {}, []
+    build_images(files, variants, report)
+    build_css(files, report)
+    build_vendor(files, report, args.fetch_vendor)
+    compressed = precompress(files)
+    write_manifest(files, variants)
+
+    before = after = 0
+    for name, original, sizes in report:
+        before += original
+        after += min(sizes.values())
+        print(f"  {name:<34} {original:>10,} B -> " + ', '.join(f"{k} {v:,}" for k, v in sizes.items()))
+    print(f"{len(files)} assets, smallest variants total {after:,} B (originals {before:,} B), "
+          f"{compressed} precompressed files written")
+
+
+if __name__ == '__main__':
+    main()
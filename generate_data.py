@@ -0,0 +1,247 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert
+from app import app, db
+from app.models import (User, Car, Component, ReceptionSlip, RepairSlip, RepairDetail,
+                        Invoice, SlipStatus)
+from app.dao import search_dao, invoice_dao, reception_dao, settings_dao
+
+# Row counts at --scale 1; everything grows linearly with the scale factor
+BASE_COMPONENTS = 200
+BASE_TECHNICIANS = 8
+BASE_CASHIERS = 3
+BASE_CARS = 4000
+BASE_SLIPS = 20000
+
+BATCH_SIZE = 5000
+# Slips in the last few days are spread over every status; older ones are almost all paid
+OPEN_DAYS = 3
+
+FAMILY_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng',
+                'Bùi', 'Đỗ', 'Hồ', 'Ngô', 'Dương', 'Lý']
+MIDDLE_NAMES = ['Văn', 'Thị', 'Minh', 'Hữu', 'Đức', 'Thanh', 'Ngọc', 'Quốc', 'Gia', 'Hoài']
+GIVEN_NAMES = ['An', 'Bình', 'Cường', 'Dũng', 'Giang', 'Hà', 'Hải', 'Hùng', 'Khánh', 'Lan', 'Linh',
+               'Long', 'Mai', 'Nam', 'Phúc', 'Quân', 'Sơn', 'Tâm', 'Thảo', 'Trang', 'Tuấn', 'Vy']
+STREETS = ['Lê Lợi', 'Nguyễn Huệ', 'Hai Bà Trưng', 'Điện Biên Phủ', 'Cách Mạng Tháng 8',
+           'Võ Văn Tần', 'Trần Hưng Đạo', 'Lý Thường Kiệt']
+DISTRICTS = ['Quận 1', 'Quận 3', 'Quận 5', 'Quận 10', 'Bình Thạnh', 'Gò Vấp', 'Thủ Đức', 'Tân Bình']
+VEHICLE_TYPES = ['Sedan', 'SUV', 'Hatchback', 'Pickup', 'MPV', 'Van']
+COLORS = ['Trắng', 'Đen', 'Bạc', 'Xám', 'Đỏ', 'Xanh', 'Vàng']
+PLATE_SERIES = 'ABCDEFGHKL'
+CATEGORIES = ['Động cơ', 'Phanh', 'Lốp', 'Điện', 'Điều hòa', 'Thân vỏ', 'Gầm', 'Bảo dưỡng']
+COMPONENT_PARTS = ['Lọc dầu', 'Lọc gió', 'Má phanh', 'Đĩa phanh', 'Lốp', 'Ắc quy', 'Bugi', 'Dây curoa',
+                   'Bơm nước', 'Két nước', 'Giảm xóc', 'Rotuyn', 'Bóng đèn', 'Gạt mưa', 'Dầu máy',
+                   'Gas điều hòa', 'Lọc nhiên liệu', 'Cảm biến oxy', 'Côn', 'Bạc đạn']
+COMPONENT_BRANDS = ['Bosch', 'Denso', 'NGK', 'Michelin', 'Castrol', 'Aisin', 'KYB', 'Toyota', 'Honda']
+PAYMENT_METHODS = ['cash', 'cash', 'card', 'transfer']
+OPEN_STATUSES = [SlipStatus.PENDING, SlipStatus.WAITING, SlipStatus.REPAIRING,
+                 SlipStatus.COMPLETED, SlipStatus.PAID]
+
+
+def license_plate(n):
+    # 51A-123.45 style; mixed radix over province, series and number keeps plates unique
+    province = 11 + n % 89
+    series = PLATE_SERIES[(n // 89) % len(PLATE_SERIES)]
+    number = n // (89 * len(PLATE_SERIES))
+    return f"{province}{series}-{number // 100:03d}.{number % 100:02d}"
+
+
+def next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+class Batcher:
+    """Collects rows per model and bulk-inserts them BATCH_SIZE at a time."""
+
+    def __init__(self):
+        self.rows = {}
+        self.counts = {}
+
+    def add(self, model, row):
+        rows = self.rows.setdefault(model, [])
+        rows.append(row)
+        if len(rows) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        # Parents first so foreign keys hold on databases that enforce them
+        for model in (Car, Component, ReceptionSlip, RepairSlip, RepairDetail, Invoice):
+            rows = self.rows.get(model)
+            if rows:
+                db.session.execute(insert(model), rows)
+                self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + len(rows)
+                self.rows[model] = []
+        db.session.commit()
+
+
+def create_staff(rng, technicians, cashiers):
+    ids = {'technician': [], 'cashier': []}
+    for role, count in (('technician', technicians), ('cashier', cashiers)):
+        existing = User.query.filter(User.role == role).order_by(User.id).all()
+        ids[role] = [u.id for u in existing]
+        for i in range(len(existing), count):
+            user = User(username=f"{role[:4]}{i + 1:03d}", password='123', role=role,
+                        full_name=f"{rng.choice(FAMILY_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(GIVEN_NAMES)}")
+            db.session.add(user)
+            db.session.flush()
+            ids[role].append(user.id)
+    db.session.commit()
+    return ids
+
+
+def create_components(rng, batcher, count):
+    components = []
+    first_id = next_id(Component)
+    for i in range(count):
+        price = round(rng.lognormvariate(12.5, 0.9), -3)
+        component = {
+            'id': first_id + i,
+            'name': f"{COMPONENT_PARTS[i % len(COMPONENT_PARTS)]} {COMPONENT_BRANDS[(i // len(COMPONENT_PARTS)) % len(COMPONENT_BRANDS)]} #{i + 1}",
+            'current_price': max(price, 10000),
+            'stock_quantity': rng.randint(0, 120),
+            'is_deleted': rng.random() < 0.03
+        }
+        batcher.add(Component, component)
+        components.append(component)
+    return components
+
+
+def create_cars(rng, batcher, count):
+    first_id = next_id(Car)
+    for i in range(count):
+        plate = license_plate(first_id + i)
+        batcher.add(Car, {
+            'id': first_id + i,
+            'license_plate': plate,
+            'plate_normalized': search_dao.normalize_plate(plate),
+            'owner_name': f"{rng.choice(FAMILY_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(GIVEN_NAMES)}",
+            'phone_number': f"09{rng.randrange(10 ** 8):08d}",
+            'address': f"{rng.randint(1, 999)} {rng.choice(STREETS)}, {rng.choice(DISTRICTS)}",
+            'email': None,
+            'vehicle_type': rng.choice(VEHICLE_TYPES),
+            'color': rng.choice(COLORS)
+        })
+    return first_id, count
+
+
+def slip_status(rng, reception_date, now):
+    if now - reception_date < timedelta(days=OPEN_DAYS):
+        return rng.choice(OPEN_STATUSES)
+    return SlipStatus.COMPLETED if rng.random() < 0.02 else SlipStatus.PAID
+
+
+def create_slips(rng, batcher, count, years, cars, components, staff, vat_rate, now):
+    first_car, car_count = cars
+    active = [c for c in components if not c['is_deleted']] or components
+    slip_id, repair_id, detail_id, invoice_id = (next_id(ReceptionSlip), next_id(RepairSlip),
+                                                 next_id(RepairDetail), next_id(Invoice))
+    start = now - timedelta(days=365 * years)
+    span = (now - start).total_seconds()
+
+    # Sorted offsets so ids follow reception order, as they would in production
+    offsets = sorted(rng.random() * span for _ in range(count))
+    for offset in offsets:
+        reception_date = start + timedelta(seconds=offset)
+        status = slip_status(rng, reception_date, now)
+        batcher.add(ReceptionSlip, {
+            'id': slip_id,
+            'car_id': first_car + rng.randrange(car_count),
+            'reception_date': reception_date,
+            'status': status.value,
+            'description': rng.choice(CATEGORIES)
+        })
+
+        if status in (SlipStatus.REPAIRING, SlipStatus.COMPLETED, SlipStatus.PAID):
+            start_date = min(reception_date + timedelta(minutes=rng.randint(10, 240)), now)
+            end_date = None
+            if status != SlipStatus.REPAIRING:
+                end_date = min(start_date + timedelta(minutes=rng.randint(30, 600)), now)
+
+            details = []
+            for _ in range(rng.randint(1, 6)):
+                component = rng.choice(active) if rng.random() < 0.85 else None
+                details.append({
+                    'id': detail_id,
+                    'repair_slip_id': repair_id,
+                    'component_id': component['id'] if component else None,
+                    'quantity': rng.randint(1, 4),
+                    'price_at_time': component['current_price'] if component else round(rng.uniform(50, 500)) * 1000,
+                    'category': rng.choice(CATEGORIES),
+                    'labor_fee': rng.choice([0, 0, 50000, 100000, 200000])
+                })
+                detail_id += 1
+            subtotal = sum(d['price_at_time'] * d['quantity'] + d['labor_fee'] for d in details)
+            labor_total = sum(d['labor_fee'] for d in details)
+            item_count = len(details)
+
+            batcher.add(RepairSlip, {
+                'id': repair_id,
+                'reception_slip_id': slip_id,
+                'technician_id': rng.choice(staff['technician']),
+                'start_date': start_date,
+                'end_date': end_date,
+                'subtotal': subtotal,
+                'item_count': item_count,
+                'labor_total': labor_total
+            })
+            for detail in details:
+                batcher.add(RepairDetail, detail)
+
+            if status == SlipStatus.PAID:
+                batcher.add(Invoice, {
+                    'id': invoice_id,
+                    'repair_slip_id': repair_id,
+                    'cashier_id': rng.choice(staff['cashier']),
+                    'total_amount': round(subtotal * (1 + vat_rate / 100), 2),
+                    'vat_rate': vat_rate,
+                    'created_at': min(end_date + timedelta(minutes=rng.randint(5, 180)), now),
+                    'payment_method': rng.choice(PAYMENT_METHODS)
+                })
+                invoice_id += 1
+            repair_id += 1
+        slip_id += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-insert deterministic synthetic workshop data')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help=f'size multiplier; 1 = {BASE_SLIPS} reception slips, 100 = {BASE_SLIPS * 100}')
+    parser.add_argument('--years', type=int, default=3, help='how many years of history to spread slips over')
+    parser.add_argument('--seed', type=int, default=42, help='random seed; the same seed gives the same data')
+    parser.add_argument('--until', type=datetime.fromisoformat,
+                        help='end of the generated history (default: start of the current hour); '
+                             'pin it to compare runs made on different days')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = args.until or datetime.now().replace(minute=0, second=0, microsecond=0)
+
+    def scaled(n):
+        return max(1, int(n * args.scale))
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        batcher = Batcher()
+
+        staff = create_staff(rng, scaled(BASE_TECHNICIANS), scaled(BASE_CASHIERS))
+        components = create_components(rng, batcher, scaled(BASE_COMPONENTS))
+        cars = create_cars(rng, batcher, scaled(BASE_CARS))
+        batcher.flush()
+        create_slips(rng, batcher, scaled(BASE_SLIPS), args.years, cars, components, staff,
+                     settings_dao.get_setting_float('vat_rate', 10.0), now)
+        batcher.flush()
+
+        search_dao.rebuild_search_index()
+        invoice_dao.rebuild_daily_revenue()
+        reception_dao.rebuild_daily_capacity()
+
+        for table, count in batcher.counts.items():
+            print(f" {table:16} {count:>10}")
+        print(f" Generated in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 from app import app, db
 from app.models import User, SystemSetting
+from app.dao import repair_dao, search_dao, invoice_dao, reception_dao
 
 with app.app_context():
     db.create_all()
@@ -22,4 +23,9 @@ with app.app_context():
         db.session.add_all(settings)
         db.session.commit()
 
+    repair_dao.recalculate_repair_totals()
+    search_dao.rebuild_search_index()
+    invoice_dao.rebuild_daily_revenue()
+    reception_dao.rebuild_daily_capacity()
+
     print(" Database initialized")
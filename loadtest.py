@@ -0,0 +1,394 @@
+import argparse
+import http.cookiejar
+import json
+import queue
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from app import app
+from app.dao import settings_dao
+
+# Logins created by init_db.py
+USERS = {'reception': 'reception', 'technician': 'tech', 'cashier': 'cashier', 'admin': 'admin'}
+# Highest max_cars_per_day the settings page accepts
+SETTINGS_MAX_CARS = 1000
+LOCK_ERRORS = ('deadlock', 'database is locked', 'lock wait timeout', 'could not serialize')
+CATEGORIES = ['Engine', 'Brake', 'Tire', 'Electrical', 'Maintenance']
+
+
+class TestClient:
+    """Drives the app in-process through Flask's test client; exceptions reach the caller."""
+
+    def __init__(self):
+        self.client = app.test_client()
+
+    def post(self, path, data):
+        response = self.client.post(path, data=data)
+        return response.status_code, response.headers.get('Location', '')
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """Drives a running server over HTTP, keeping its own session cookie."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+
+    def post(self, path, data):
+        body = urllib.parse.urlencode(data).encode()
+        try:
+            with self.opener.open(self.base_url + path, data=body, timeout=60) as response:
+                return response.status, response.headers.get('Location', '')
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Location', '')
+
+    def get(self, path):
+        try:
+            with self.opener.open(self.base_url + path, timeout=60) as response:
+                return response.status, response.read().decode('utf-8')
+        except urllib.error.HTTPError as e:
+            return e.code, ''
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.lock_errors = {}
+        self.error_samples = []
+        self.workflows = 0
+
+    def record(self, route, seconds, error=None, lock_error=False):
+        with self.lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            if error:
+                self.errors[route] = self.errors.get(route, 0) + 1
+                if lock_error:
+                    self.lock_errors[route] = self.lock_errors.get(route, 0) + 1
+                if len(self.error_samples) < 20:
+                    self.error_samples.append(f"{route}: {error}")
+
+    def finish_workflow(self):
+        with self.lock:
+            self.workflows += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Worker(threading.Thread):
+    def __init__(self, role, make_client, stats, think_time, rng):
+        super().__init__(daemon=True)
+        self.role = role
+        self.client = make_client()
+        self.stats = stats
+        self.think_time = think_time
+        self.rng = rng
+
+    def login(self):
+        # Every role was checked once up front by check_logins(); a failure here is a server error
+        start = time.perf_counter()
+        status, _ = self.client.post('/login', {'username': USERS[self.role], 'password': '123'})
+        if status != 302:
+            self.stats.record('main.login', time.perf_counter() - start, f"HTTP {status} logging in as {self.role}")
+            return False
+        return True
+
+    def call(self, route, path, data, expect_location=None):
+        """POST and time one step; returns the redirect Location or None when the step failed."""
+        start = time.perf_counter()
+        try:
+            status, location = self.client.post(path, data)
+        except Exception as e:
+            message = f"{type(e).__name__}: {str(e).splitlines()[0][:200]}"
+            self.stats.record(route, time.perf_counter() - start, message,
+                              any(s in str(e).lower() for s in LOCK_ERRORS))
+            return None
+
+        elapsed = time.perf_counter() - start
+        if status != 302 or (expect_location and expect_location not in location):
+            self.stats.record(route, elapsed, f"HTTP {status} -> {location or '-'}",
+                              status in (409, 423, 503))
+            return None
+        self.stats.record(route, elapsed)
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, self.think_time * 2))
+        return location
+
+
+def login(client, role):
+    status, _ = client.post('/login', {'username': USERS[role], 'password': '123'})
+    return status == 302
+
+
+def check_logins(make_client, roles):
+    for role in roles:
+        if not login(make_client(), role):
+            raise SystemExit(f"could not log in as {USERS[role]}; run init_db.py first")
+
+
+class Receptionist(Worker):
+    def __init__(self, plates, out_queue, *args):
+        super().__init__('reception', *args)
+        self.plates = plates
+        self.out_queue = out_queue
+
+    def slip_id_for_plate(self, plate):
+        # The add form redirects to the list, so find the new slip there; the plate is unique to this run
+        start = time.perf_counter()
+        status, html = self.client.get('/reception/?' + urllib.parse.urlencode({'q': plate}))
+        match = re.search(r'/reception/detail/(\d+)', html) if status == 200 else None
+        if not match:
+            self.stats.record('reception.home', time.perf_counter() - start, f"slip for {plate} not listed (HTTP {status})")
+            return None
+        self.stats.record('reception.home', time.perf_counter() - start)
+        return int(match.group(1))
+
+    def run(self):
+        if not self.login():
+            return
+        for plate in iter(self.plates.get, None):
+            location = self.call('reception.add_car', '/reception/add', {
+                'license_plate': plate,
+                'owner_name': f"Load Test {plate}",
+                'phone_number': f"09{self.rng.randrange(10 ** 8):08d}",
+                'address': 'Load test',
+                'description': self.rng.choice(CATEGORIES)
+            }, expect_location='/reception/')
+            if location is not None:
+                slip_id = self.slip_id_for_plate(plate)
+                if slip_id:
+                    self.out_queue.put(slip_id)
+
+
+class Technician(Worker):
+    def __init__(self, in_queue, out_queue, items, *args):
+        super().__init__('technician', *args)
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.component_ids = None
+        self.items = items
+
+    def load_component_ids(self, repair_id):
+        # Components offered in the add-item form, read from the server rather than a local database
+        status, html = self.client.get(f"/technician/repair/{repair_id}/add")
+        self.component_ids = [int(v) for v in re.findall(r'<option value="(\d+)"', html)][:50] if status == 200 else []
+
+    def run(self):
+        if not self.login():
+            return
+        for slip_id in iter(self.in_queue.get, None):
+            location = self.call('technician.start_repair', f"/technician/start/{slip_id}", {},
+                                 expect_location='/technician/repair/')
+            match = re.search(r'/technician/repair/(\d+)/add', location or '')
+            if not match:
+                continue
+            repair_id = int(match.group(1))
+            if self.component_ids is None:
+                self.load_component_ids(repair_id)
+
+            for _ in range(self.items):
+                component_id = self.rng.choice(self.component_ids) if self.component_ids else ''
+                self.call('technician.add_item', f"/technician/repair/{repair_id}/add_item", {
+                    'component_id': component_id,
+                    'quantity': self.rng.randint(1, 3),
+                    'current_price': self.rng.choice([50000, 120000, 350000]),
+                    'category': self.rng.choice(CATEGORIES)
+                })
+
+            if self.call('technician.finish_repair', f"/technician/repair/{repair_id}/finish", {}) is not None:
+                self.out_queue.put(repair_id)
+
+
+class Cashier(Worker):
+    def __init__(self, in_queue, *args):
+        super().__init__('cashier', *args)
+        self.in_queue = in_queue
+
+    def run(self):
+        if not self.login():
+            return
+        for repair_id in iter(self.in_queue.get, None):
+            if self.call('cashier.process_payment', f"/cashier/pay/{repair_id}", {},
+                         expect_location='/cashier/') is not None:
+                self.stats.finish_workflow()
+
+
+class DailyLimit:
+    """Raises max_cars_per_day for the run and puts the old value back afterwards.
+
+    In-process the app's own settings are changed; against --url the admin settings
+    page of that server is used, since the local database may not be the server's.
+    """
+
+    def __init__(self, client=None):
+        self.client = client
+        self.previous = None
+
+    def lift(self):
+        if self.client is None:
+            with app.app_context():
+                self.previous = settings_dao.get_setting('max_cars_per_day') or '30'
+                settings_dao.set_setting('max_cars_per_day', str(10 ** 9))
+            return
+        if not login(self.client, 'admin'):
+            raise SystemExit("--lift-daily-limit needs the admin login against --url")
+        _, html = self.client.get('/admin/vat-settings')
+        match = re.search(r'name="max_cars"[^>]*?value="(\d+)"', html, re.S)
+        if not match:
+            raise SystemExit("could not read max_cars_per_day from /admin/vat-settings")
+        self.previous = match.group(1)
+        self._set(SETTINGS_MAX_CARS)
+
+    def restore(self):
+        if self.previous is None:
+            return
+        if self.client is None:
+            with app.app_context():
+                settings_dao.set_setting('max_cars_per_day', self.previous)
+        else:
+            self._set(self.previous)
+
+    def _set(self, value):
+        self.client.post('/admin/vat-settings/update-vehicle-limit', {'max_cars': value})
+
+
+def report(stats, wall_seconds):
+    rows = []
+    for route, values in stats.latencies.items():
+        values = sorted(v * 1000 for v in values)
+        rows.append({
+            'route': route,
+            'requests': len(values),
+            'errors': stats.errors.get(route, 0),
+            'lock_errors': stats.lock_errors.get(route, 0),
+            'p50_ms': round(percentile(values, 50), 2),
+            'p95_ms': round(percentile(values, 95), 2),
+            'p99_ms': round(percentile(values, 99), 2),
+            'max_ms': round(values[-1], 2),
+            'throughput_rps': round(len(values) / wall_seconds, 2) if wall_seconds else 0.0
+        })
+    order = ['reception.add_car', 'reception.home', 'technician.start_repair', 'technician.add_item',
+             'technician.finish_repair', 'cashier.process_payment']
+    rows.sort(key=lambda r: order.index(r['route']) if r['route'] in order else len(order))
+
+    print(f"\n {'route':26} {'reqs':>6} {'err':>5} {'lock':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'req/s':>8}")
+    for r in rows:
+        print(f" {r['route']:26} {r['requests']:>6} {r['errors']:>5} {r['lock_errors']:>5} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f} {r['throughput_rps']:>8.2f}")
+
+    summary = {
+        'wall_seconds': round(wall_seconds, 2),
+        'workflows_completed': stats.workflows,
+        'workflows_per_second': round(stats.workflows / wall_seconds, 2) if wall_seconds else 0.0,
+        'errors': sum(stats.errors.values()),
+        'lock_errors': sum(stats.lock_errors.values())
+    }
+    print(f"\n {summary['workflows_completed']} workflows in {summary['wall_seconds']}s "
+          f"({summary['workflows_per_second']}/s), {summary['errors']} errors, "
+          f"{summary['lock_errors']} deadlocks/lock timeouts")
+    for sample in stats.error_samples:
+        print(f"   ! {sample}")
+    return {'summary': summary, 'routes': rows, 'error_samples': stats.error_samples}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Concurrent reception -> repair -> payment load test. '
+                    'It writes real rows; point DATABASE_URL at a throwaway database.')
+    parser.add_argument('--cars', type=int, default=200, help='cars to push through the whole workflow')
+    parser.add_argument('--receptionists', type=int, default=2)
+    parser.add_argument('--technicians', type=int, default=6)
+    parser.add_argument('--cashiers', type=int, default=2)
+    parser.add_argument('--items', type=int, default=3, help='repair items added per car')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean pause in seconds after each step')
+    parser.add_argument('--url', help='base URL of a running server; default drives the app in-process')
+    parser.add_argument('--lift-daily-limit', action='store_true',
+                        help='raise max_cars_per_day for the run and restore it afterwards '
+                             f'(against --url: through the admin settings page, up to {SETTINGS_MAX_CARS})')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the report as JSON')
+    args = parser.parse_args()
+
+    app.config['TESTING'] = True
+    app.config['SQL_QUERY_BUDGET_MODE'] = 'log'
+    rng = random.Random(args.seed)
+
+    def make_client():
+        return HttpClient(args.url) if args.url else TestClient()
+
+    # Fail here, not inside a worker thread, when the logins are missing
+    check_logins(make_client, ['reception', 'technician', 'cashier'])
+    daily_limit = DailyLimit(make_client() if args.url else None)
+    if args.lift_daily_limit:
+        daily_limit.lift()
+
+    run_tag = f"{rng.randrange(16 ** 4):04X}"
+    plates, slips, repairs = queue.Queue(), queue.Queue(), queue.Queue()
+    for n in range(args.cars):
+        plates.put(f"LT{run_tag}-{n:06d}")
+    for _ in range(args.receptionists):
+        plates.put(None)
+
+    stats = Stats()
+
+    def worker_args():
+        return make_client, stats, args.think_time, random.Random(rng.random())
+
+    receptionists = [Receptionist(plates, slips, *worker_args()) for _ in range(args.receptionists)]
+    technicians = [Technician(slips, repairs, args.items, *worker_args())
+                   for _ in range(args.technicians)]
+    cashiers = [Cashier(repairs, *worker_args()) for _ in range(args.cashiers)]
+
+    print(f" {args.cars} cars, {args.receptionists} receptionists, {args.technicians} technicians, "
+          f"{args.cashiers} cashiers against {args.url or app.config['SQLALCHEMY_DATABASE_URI'].split('@')[-1]}")
+    started = time.perf_counter()
+    try:
+        for worker in receptionists + technicians + cashiers:
+            worker.start()
+
+        # Shut each stage down once the one feeding it has drained
+        for worker in receptionists:
+            worker.join()
+        for _ in technicians:
+            slips.put(None)
+        for worker in technicians:
+            worker.join()
+        for _ in cashiers:
+            repairs.put(None)
+        for worker in cashiers:
+            worker.join()
+        wall = time.perf_counter() - started
+    finally:
+        daily_limit.restore()
+
+    result = report(stats, wall)
+    if args.output:
+        result['meta'] = {'started_at': datetime.now().isoformat(timespec='seconds'), **vars(args)}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
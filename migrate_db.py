@@ -0,0 +1,88 @@
+import argparse
+from sqlalchemy import inspect, text
+from app import app, db
+from app.dao import repair_dao, search_dao, invoice_dao, reception_dao
+
+# db.create_all() only creates missing tables; it never adds a column or an index to a
+# table that already exists. This script brings an existing database up to the models:
+#   - new tables: daily_revenue, daily_capacity, table_versions
+#   - new columns: repair_slips.subtotal / item_count / labor_total, cars.plate_normalized
+#   - new indexes: reception_slips (reception_date, id), repair_slips (end_date, id),
+#     invoices.created_at, cars.plate_normalized
+# and then backfills the data those depend on. Every step checks first, so it is safe to
+# run again.
+
+# Defaults written into existing rows when a NOT NULL-ish counter column is added
+COLUMN_DEFAULTS = {
+    ('repair_slips', 'subtotal'): '0',
+    ('repair_slips', 'item_count'): '0',
+    ('repair_slips', 'labor_total'): '0',
+}
+
+
+def create_tables(inspector):
+    missing = [table for name, table in db.metadata.tables.items() if not inspector.has_table(name)]
+    if missing:
+        db.metadata.create_all(db.engine, tables=missing)
+    for table in missing:
+        print(f"  created table {table.name}")
+    return {table.name for table in missing}
+
+
+def add_columns(inspector, created):
+    dialect = db.engine.dialect
+    for name, table in db.metadata.tables.items():
+        if name in created:
+            continue
+        existing = {column['name'] for column in inspector.get_columns(name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+            default = COLUMN_DEFAULTS.get((name, column.name))
+            if default is not None:
+                ddl += f" DEFAULT {default}"
+            db.session.execute(text(ddl))
+            print(f"  added column {name}.{column.name}")
+    db.session.commit()
+
+
+def add_indexes(inspector, created):
+    for name, table in db.metadata.tables.items():
+        if name in created:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                print(f"  created index {index.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Add the tables, columns and indexes newer code expects, then backfill them')
+    parser.add_argument('--skip-backfill', action='store_true', help='only change the schema')
+    args = parser.parse_args()
+
+    with app.app_context():
+        created = create_tables(inspect(db.engine))
+        # A fresh inspector: the one above cached the table list from before create_all
+        inspector = inspect(db.engine)
+        add_columns(inspector, created)
+        add_indexes(inspector, created)
+        print(" Schema up to date")
+
+        if args.skip_backfill:
+            return
+        repair_dao.recalculate_repair_totals()
+        print("  repair slip totals recalculated")
+        search_dao.rebuild_search_index()
+        print("  normalized plates and search index rebuilt")
+        invoice_dao.rebuild_daily_revenue()
+        print("  daily revenue rebuilt")
+        reception_dao.rebuild_daily_capacity()
+        print("  daily capacity rebuilt")
+        print(" Data backfilled")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+import argparse
+from datetime import date
+from app import app
+from app.dao import invoice_dao
+
+parser = argparse.ArgumentParser(description='Rebuild the daily_revenue rollup from invoices')
+parser.add_argument('--start', type=date.fromisoformat, help='first day to rebuild (YYYY-MM-DD)')
+parser.add_argument('--end', type=date.fromisoformat, help='last day to rebuild (YYYY-MM-DD)')
+args = parser.parse_args()
+
+with app.app_context():
+    invoice_dao.rebuild_daily_revenue(args.start, args.end)
+
+    print(" Daily revenue rebuilt")